@@ -2,19 +2,425 @@
 Incident Classifier Agent using Portia AI SDK
 """
 import json
-import sys
-import os
+import re
+import time
+from functools import lru_cache
 from datetime import datetime
-from typing import Dict, Any, Type
+from typing import Callable, Dict, Any, List, Optional, Type
 from pydantic import BaseModel, Field
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
-
 # Import Portia Tool class
 from portia import Tool, ToolRunContext
 
+try:
+    import orjson
+    _loads = orjson.loads  # raises orjson.JSONDecodeError, a json.JSONDecodeError subclass
+except ImportError:
+    _loads = json.loads
+
+
+# Last formatted second and its ISO string, refreshed when the clock ticks over
+_ts_cache = [0, ""]
+
+
+def _now_iso() -> str:
+    """Second-resolution ISO timestamp, reformatted at most once per second"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache[:] = [now, datetime.fromtimestamp(now).isoformat()]
+    return _ts_cache[1]
+
+
+# Every keyword any rule looks for in the alert message, compiled into one
+# pattern so the message is scanned exactly once per classification. The
+# lookahead reports every occurrence, including overlapping ones. No keyword
+# is a prefix of another except "error"/"error rate", which the scanner
+# reconciles, so at most one alternative can match at each position.
+_MESSAGE_KEYWORDS = (
+    # category
+    "database", "connection", "query", "sql", "redis", "mongo",
+    "network", "latency", "timeout", "ssl", "certificate", "dns",
+    "cdn", "proxy", "gateway",
+    "application", "service", "endpoint", "api", "error rate", "error",
+    "cpu", "memory", "disk", "storage", "filesystem",
+    # severity
+    "down", "failed", "critical", "emergency", "outage", "health check",
+    # tags
+    "backup", "cluster",
+)
+_MESSAGE_KEYWORD_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(keyword) for keyword in _MESSAGE_KEYWORDS) + "))"
+)
+
+_DATABASE_KEYWORDS = frozenset({"database", "connection", "query", "sql", "redis", "mongo"})
+_NETWORK_KEYWORDS = frozenset({"network", "latency", "timeout", "ssl", "certificate", "dns"})
+_EDGE_KEYWORDS = frozenset({"cdn", "proxy", "gateway"})
+_APPLICATION_KEYWORDS = frozenset({"application", "service", "endpoint", "api", "error rate"})
+_INFRASTRUCTURE_KEYWORDS = frozenset({"cpu", "memory", "disk", "storage", "filesystem"})
+_SECURITY_KEYWORDS = frozenset({"ssl", "certificate"})
+
+_METRIC_NAMES = ("cpu_usage", "memory_usage", "error_rate", "response_time")
+
+_INFRASTRUCTURE_ALERT_TYPES = frozenset({"cpu", "memory", "disk"})
+
+_SEVERITY_SCORES = {"critical": 4, "high": 3, "medium": 2, "low": 1}
+
+_CRITICAL_KEYWORDS = frozenset({"down", "failed", "critical", "emergency", "outage"})
+
+_CATEGORY_CONFIDENCE_KEYWORDS = {
+    "database": frozenset({"database", "connection", "query", "sql"}),
+    "network": frozenset({"network", "latency", "ssl", "dns"}),
+    "application": frozenset({"application", "service", "api", "error"}),
+    "infrastructure": frozenset({"cpu", "memory", "disk", "storage"}),
+}
+
+# Critical services that affect user experience (matched as substrings)
+_CRITICAL_SERVICE_PATTERN = re.compile(r"auth|api-gateway|payment|checkout|user")
+
+# Business impact keyed by (severity, critical services affected, category).
+# Critical/high impact depends only on service criticality, medium impact only
+# on category; None marks the dimension a row does not discriminate on.
+_IMPACT_TABLE = {
+    ("critical", True, None): "High - Critical user-facing services affected",
+    ("critical", False, None): "Medium-High - System stability compromised",
+    ("high", True, None): "Medium-High - User experience degraded",
+    ("high", False, None): "Medium - Internal systems affected",
+    ("medium", None, "database"): "Medium - Data integrity or availability concerns",
+    ("medium", None, None): "Low-Medium - Limited service impact",
+}
+_DEFAULT_IMPACT = "Low - Minimal business impact"
+_SERVICE_SENSITIVE_SEVERITIES = frozenset({"critical", "high"})
+
+
+def _compile_metric_rules(rules: tuple) -> Callable[[Dict], list[str]]:
+    """Compile ``(metric, threshold, label)`` rules into a single evaluator.
+
+    The rule table is bound into the closure once at import, so each alert is
+    checked with one pass over pre-resolved tuples instead of a chain of
+    interpreted conditionals. The evaluator returns the labels of every rule
+    whose metric exceeds its threshold; missing or null readings never fire.
+    """
+    def evaluate(metrics: Dict) -> list[str]:
+        get = metrics.get
+        return [label for metric, threshold, label in rules if (get(metric) or 0) > threshold]
+
+    return evaluate
+
+
+# Each breached threshold adds one point to the severity score
+_severity_metric_breaches = _compile_metric_rules((
+    ("cpu_usage", 95, "cpu"),
+    ("memory_usage", 90, "memory"),
+    ("error_rate", 0.1, "error_rate"),
+    ("response_time", 5000, "response_time"),
+))
+
+_metric_tags = _compile_metric_rules((
+    ("cpu_usage", 90, "high-cpu"),
+    ("memory_usage", 85, "high-memory"),
+    ("error_rate", 0.05, "high-error-rate"),
+    ("response_time", 3000, "slow-response"),
+))
+
+# Metrics that justify (and explain) a critical severity
+_critical_metric_factors = _compile_metric_rules((
+    ("cpu_usage", 95, "- CPU usage exceeding 95%"),
+    ("error_rate", 0.2, "- Error rate above 20%"),
+))
+
+# Reasoning fragments appended after the category sentence
+_CRITICAL_REASONING = " Severity elevated to CRITICAL due to:"
+_HIGH_SEVERITY_REASONING = " Assessed as HIGH severity due to significant system impact."
+_HIGH_CONFIDENCE_REASONING = " High confidence classification based on clear indicators."
+_LOW_CONFIDENCE_REASONING = " Moderate confidence - may require manual review."
+
+
+def _scan_keywords(message: str) -> frozenset:
+    """Return the set of known keywords that occur in the (lowercased) message"""
+    found = set(_MESSAGE_KEYWORD_PATTERN.findall(message))
+    if "error rate" in found:
+        found.add("error")  # shadowed by the longer alternative at the same position
+    return frozenset(found)
+
+
+def _parse_alert_data(alert_data: Any) -> Any:
+    """Decode an alert payload (JSON string, dict or model) into plain data"""
+    if isinstance(alert_data, str):
+        try:
+            return _loads(alert_data)
+        except json.JSONDecodeError:
+            return {"raw_data": alert_data}
+    if isinstance(alert_data, dict):
+        return alert_data
+    if hasattr(alert_data, 'dict'):
+        return alert_data.dict()
+    return {}
+
+
+def _validate_alert_info(alert_info: Any) -> Optional[str]:
+    """Describe the first field the rules can't use, or return None if the alert is valid"""
+    if not isinstance(alert_info, dict):
+        return f"alert data must be an object, not {type(alert_info).__name__}"
+    message = alert_info.get("message")
+    if message is not None and not isinstance(message, str):
+        return "message must be a string"
+    services = alert_info.get("affected_services")
+    if services is not None and not (
+        isinstance(services, (list, tuple)) and all(isinstance(service, str) for service in services)
+    ):
+        return "affected_services must be a list of strings"
+    metrics = alert_info.get("metrics")
+    if metrics is not None:
+        if not isinstance(metrics, dict):
+            return "metrics must be an object"
+        for name in _METRIC_NAMES:
+            value = metrics.get(name)
+            if value is not None and not isinstance(value, (int, float)):
+                return f"metric '{name}' must be numeric"
+    return None
+
+
+def _classify_alert_data(alert_data: Any) -> Dict[str, Any]:
+    """Classify a single alert payload, falling back to a needs-review result if it is invalid"""
+    alert_info = _parse_alert_data(alert_data)
+    error = _validate_alert_info(alert_info)
+    if error is not None:
+        return _fallback_classification(error)
+    return _classify_fast(alert_info)
+
+
+def _classify_fast(alert_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Classify a validated alert"""
+    metrics = alert_info.get("metrics") or {}
+    
+    # Everything the rules look at, in hashable form
+    classification = _classify_fields(
+        str(alert_info.get("alert_type", "")).lower(),
+        str(alert_info.get("severity", "")).lower(),
+        (alert_info.get("message") or "").lower(),
+        tuple(alert_info.get("affected_services") or ()),
+        tuple(metrics.get(name) for name in _METRIC_NAMES),
+        (
+            bool(alert_info.get("alert_type")),
+            bool(metrics),
+            bool(alert_info.get("affected_services")),
+            bool(alert_info.get("source_system")),
+        ),
+    )
+    
+    return {
+        "incident_id": alert_info.get("id", "unknown"),
+        **classification,
+        "tags": list(classification["tags"]),  # cached list must not be shared
+        "generated_at": _now_iso()
+    }
+
+
+def _fallback_classification(error: str) -> Dict[str, Any]:
+    """Needs-review classification for alerts the rules can't evaluate"""
+    return {
+        "incident_id": "unknown",
+        "category": "unknown",
+        "severity": "medium",
+        "confidence": 0.3,
+        "tags": ["unclassified", "needs-review"],
+        "estimated_impact": "unknown",
+        "reasoning": f"Classification failed: {error}. Manual review required.",
+        "generated_at": _now_iso()
+    }
+
+
+# Duplicate alerts are common during an incident, so results are memoized by
+# alert fingerprint
+@lru_cache(maxsize=8192)
+def _classify_fields(alert_type: str, severity: str, message: str, services: tuple,
+                     metric_values: tuple, present_fields: tuple) -> Dict[str, Any]:
+    """Run the classification rules on a fingerprinted alert (pure, safe to memoize).
+    ``metric_values`` follow ``_METRIC_NAMES``; ``present_fields`` flags which
+    optional alert fields were populated.
+    """
+    metrics = dict(zip(_METRIC_NAMES, metric_values))
+    affected_services = list(services)
+    # One newline-separated string so service keyword checks are a single
+    # substring scan; no keyword contains a newline, so matches can't
+    # straddle two service names
+    services_text = "\n".join(affected_services)
+    keywords = _scan_keywords(message)
+
+    # Determine category
+    category = _determine_category(alert_type, keywords, services_text)
+
+    # Assess severity with context
+    assessed_severity = _assess_severity(severity, metrics, keywords, category)
+
+    # Calculate confidence
+    confidence = _calculate_confidence(present_fields, metrics, keywords, category, assessed_severity)
+
+    # Generate tags
+    tags = _generate_tags(alert_type, keywords, affected_services, metrics)
+
+    # Estimate impact
+    impact = _estimate_impact(assessed_severity, services_text, category)
+
+    # Generate reasoning
+    reasoning = _generate_reasoning(category, assessed_severity, confidence, metrics)
+
+    return {
+        "category": category,
+        "severity": assessed_severity,
+        "confidence": confidence,
+        "tags": tags,
+        "estimated_impact": impact,
+        "reasoning": reasoning,
+    }
+
+
+def _determine_category(alert_type: str, keywords: frozenset, services_text: str) -> str:
+    """Determine incident category based on alert characteristics.
+    ``keywords`` are the message keywords found by ``_scan_keywords`` and
+    ``services_text`` is the newline-joined list of affected services.
+    """
+    # Database-related keywords
+    if not keywords.isdisjoint(_DATABASE_KEYWORDS):
+        return "database"
+    if "database" in alert_type or "db" in alert_type:
+        return "database"
+    if "db" in services_text:
+        return "database"
+
+    # Network-related keywords  
+    if not keywords.isdisjoint(_NETWORK_KEYWORDS):
+        return "network"
+    if alert_type == "network":
+        return "network"
+    if not keywords.isdisjoint(_EDGE_KEYWORDS):
+        return "network"
+
+    # Application-related keywords
+    if not keywords.isdisjoint(_APPLICATION_KEYWORDS):
+        return "application"
+    if alert_type == "application":
+        return "application"
+    if "service" in services_text:
+        return "application"
+
+    # Infrastructure-related (CPU, memory, disk)
+    if alert_type in _INFRASTRUCTURE_ALERT_TYPES:
+        return "infrastructure"
+    if not keywords.isdisjoint(_INFRASTRUCTURE_KEYWORDS):
+        return "infrastructure"
+
+    return "infrastructure"  # Default fallback
+
+
+def _assess_severity(original_severity: str, metrics: Dict, keywords: frozenset, category: str) -> str:
+    """Assess and potentially adjust severity based on context"""
+
+    # Base severity mapping plus one point per breached metric threshold
+    severity_score = (
+        _SEVERITY_SCORES.get(original_severity, 2)
+        + len(_severity_metric_breaches(metrics))
+    )
+
+    # Message-based severity indicators
+    severity_score += not keywords.isdisjoint(_CRITICAL_KEYWORDS)
+
+    # Category-specific adjustments: DB connection issues are typically
+    # severe and health check failures are critical
+    severity_score += category == "database" and "connection" in keywords
+    severity_score += category == "application" and "health check" in keywords
+
+    # Convert score back to severity level
+    if severity_score >= 5:
+        return "critical"
+    elif severity_score >= 4:
+        return "high"
+    elif severity_score >= 3:
+        return "medium"
+    else:
+        return "low"
+
+
+def _calculate_confidence(present_fields: tuple, metrics: Dict, keywords: frozenset,
+                          category: str, severity: str) -> float:
+    """Calculate confidence score for the classification.
+    ``present_fields`` flags which optional alert fields were populated and
+    ``keywords`` are the message keywords found by ``_scan_keywords``.
+    """
+    confidence = 0.5  # Base confidence
+
+    # Data completeness boosts confidence
+    for present in present_fields:
+        if present:
+            confidence += 0.1
+
+    # Clear categorization patterns boost confidence
+    category_keywords = _CATEGORY_CONFIDENCE_KEYWORDS.get(category)
+    if category_keywords is not None:
+        keyword_matches = len(category_keywords & keywords)
+        confidence += min(keyword_matches * 0.05, 0.2)
+
+    # Severity alignment with metrics
+    if severity == "critical" and _critical_metric_factors(metrics):
+        confidence += 0.1
+
+    return min(confidence, 1.0)
+
+
+def _generate_tags(alert_type: str, keywords: frozenset, services: list, metrics: Dict) -> list[str]:
+    """Generate relevant tags for the incident"""
+    tags = []
+
+    # Alert type tag
+    if alert_type:
+        tags.append(alert_type)
+
+    # Service tags
+    for service in services[:3]:  # Limit to first 3 services
+        tags.append(f"service:{service}")
+
+    # Metric-based tags
+    tags.extend(_metric_tags(metrics))
+
+    # Message-based tags
+    if "backup" in keywords:
+        tags.append("backup")
+    if not keywords.isdisjoint(_SECURITY_KEYWORDS):
+        tags.append("security")
+    if "cluster" in keywords:
+        tags.append("clustering")
+
+    return tags
+
+
+def _estimate_impact(severity: str, services_text: str, category: str) -> str:
+    """Estimate business impact of the incident"""
+    if severity in _SERVICE_SENSITIVE_SEVERITIES:
+        service_criticality = _CRITICAL_SERVICE_PATTERN.search(services_text.lower()) is not None
+        return _IMPACT_TABLE[(severity, service_criticality, None)]
+
+    return (_IMPACT_TABLE.get((severity, None, category))
+            or _IMPACT_TABLE.get((severity, None, None), _DEFAULT_IMPACT))
+
+
+def _generate_reasoning(category: str, severity: str, confidence: float, metrics: Dict) -> str:
+    """Generate human-readable reasoning for the classification"""
+    severity_reasoning = (
+        _CRITICAL_REASONING + "".join(f" {factor}" for factor in _critical_metric_factors(metrics))
+        if severity == "critical"
+        else _HIGH_SEVERITY_REASONING if severity == "high"
+        else ""
+    )
+    confidence_reasoning = (
+        _HIGH_CONFIDENCE_REASONING if confidence > 0.8
+        else _LOW_CONFIDENCE_REASONING if confidence < 0.6
+        else ""
+    )
+    return (
+        f"Classified as '{category}' incident based on alert characteristics."
+        f"{severity_reasoning}{confidence_reasoning}"
+    )
+
 
 class ClassificationInput(BaseModel):
     """Input schema for incident classification"""
@@ -67,269 +473,14 @@ class IncidentClassifierTool(Tool):
                 if value is not None:
                     alert_data = value
                     break
-        try:
-            # Parse alert data if it's a JSON string
-            if isinstance(alert_data, str):
-                try:
-                    alert_info = json.loads(alert_data)
-                except json.JSONDecodeError:
-                    alert_info = {"raw_data": alert_data}
-            elif isinstance(alert_data, dict):
-                alert_info = alert_data
-            elif hasattr(alert_data, 'dict'):
-                alert_info = alert_data.dict()
-            else:
-                alert_info = {}
-            
-            # Parse alert data
-            alert_type = str(alert_info.get("alert_type", "")).lower()
-            severity = str(alert_info.get("severity", "")).lower()
-            metrics = alert_info.get("metrics", {})
-            message = alert_info.get("message", "").lower()
-            affected_services = alert_info.get("affected_services", [])
-            
-            # Determine category
-            category = self._determine_category(alert_type, message, affected_services)
-            
-            # Assess severity with context
-            assessed_severity = self._assess_severity(severity, metrics, message, category)
-            
-            # Calculate confidence
-            confidence = self._calculate_confidence(alert_info, category, assessed_severity)
-            
-            # Generate tags
-            tags = self._generate_tags(alert_type, message, affected_services, metrics)
-            
-            # Estimate impact
-            impact = self._estimate_impact(assessed_severity, affected_services, category)
-            
-            # Generate reasoning
-            reasoning = self._generate_reasoning(category, assessed_severity, confidence, metrics)
-            
-            return {
-                "incident_id": alert_info.get("id", "unknown"),
-                "category": category,
-                "severity": assessed_severity,
-                "confidence": confidence,
-                "tags": tags,
-                "estimated_impact": impact,
-                "reasoning": reasoning,
-                "generated_at": datetime.now().isoformat()
-            }
-            
-        except Exception as e:
-            # Fallback classification
-            return {
-                "incident_id": "unknown",
-                "category": "unknown",
-                "severity": "medium",
-                "confidence": 0.3,
-                "tags": ["unclassified", "needs-review"],
-                "estimated_impact": "unknown",
-                "reasoning": f"Classification failed: {str(e)}. Manual review required.",
-                "generated_at": datetime.now().isoformat()
-            }
-    
-    def _determine_category(self, alert_type: str, message: str, services: list) -> str:
-        """Determine incident category based on alert characteristics"""
-        
-        # Database-related keywords
-        if any(word in message for word in ["database", "connection", "query", "sql", "redis", "mongo"]):
-            return "database"
-        if any(word in alert_type for word in ["database", "db"]):
-            return "database"
-        if any("db" in service for service in services):
-            return "database"
-            
-        # Network-related keywords  
-        if any(word in message for word in ["network", "latency", "timeout", "ssl", "certificate", "dns"]):
-            return "network"
-        if alert_type in ["network"]:
-            return "network"
-        if any(word in message for word in ["cdn", "proxy", "gateway"]):
-            return "network"
-            
-        # Application-related keywords
-        if any(word in message for word in ["application", "service", "endpoint", "api", "error rate"]):
-            return "application"
-        if alert_type in ["application"]:
-            return "application"
-        if any("service" in service for service in services):
-            return "application"
-            
-        # Infrastructure-related (CPU, memory, disk)
-        if alert_type in ["cpu", "memory", "disk"]:
-            return "infrastructure"
-        if any(word in message for word in ["cpu", "memory", "disk", "storage", "filesystem"]):
-            return "infrastructure"
-            
-        return "infrastructure"  # Default fallback
-    
-    def _assess_severity(self, original_severity: str, metrics: Dict, message: str, category: str) -> str:
-        """Assess and potentially adjust severity based on context"""
-        
-        severity_score = 0
-        
-        # Base severity mapping
-        severity_map = {"critical": 4, "high": 3, "medium": 2, "low": 1}
-        base_score = severity_map.get(original_severity, 2)
-        severity_score += base_score
-        
-        # Metric-based adjustments
-        if metrics.get("cpu_usage", 0) > 95:
-            severity_score += 1
-        if metrics.get("memory_usage", 0) > 90:
-            severity_score += 1
-        if metrics.get("error_rate", 0) > 0.1:
-            severity_score += 1
-        if metrics.get("response_time", 0) > 5000:
-            severity_score += 1
-            
-        # Message-based severity indicators
-        critical_keywords = ["down", "failed", "critical", "emergency", "outage"]
-        if any(word in message for word in critical_keywords):
-            severity_score += 1
-            
-        # Category-specific adjustments
-        if category == "database" and "connection" in message:
-            severity_score += 1  # DB connection issues are typically severe
-        if category == "application" and "health check" in message:
-            severity_score += 1  # Health check failures are critical
-            
-        # Convert score back to severity level
-        if severity_score >= 5:
-            return "critical"
-        elif severity_score >= 4:
-            return "high"
-        elif severity_score >= 3:
-            return "medium"
-        else:
-            return "low"
-    
-    def _calculate_confidence(self, alert_data: Dict, category: str, severity: str) -> float:
-        """Calculate confidence score for the classification"""
-        
-        confidence = 0.5  # Base confidence
-        
-        # Data completeness boosts confidence
-        if alert_data.get("alert_type"):
-            confidence += 0.1
-        if alert_data.get("metrics"):
-            confidence += 0.1
-        if alert_data.get("affected_services"):
-            confidence += 0.1
-        if alert_data.get("source_system"):
-            confidence += 0.1
-            
-        # Clear categorization patterns boost confidence
-        message = alert_data.get("message", "").lower()
-        category_keywords = {
-            "database": ["database", "connection", "query", "sql"],
-            "network": ["network", "latency", "ssl", "dns"],
-            "application": ["application", "service", "api", "error"],
-            "infrastructure": ["cpu", "memory", "disk", "storage"]
-        }
-        
-        if category in category_keywords:
-            keyword_matches = sum(1 for keyword in category_keywords[category] if keyword in message)
-            confidence += min(keyword_matches * 0.05, 0.2)
-            
-        # Severity alignment with metrics
-        metrics = alert_data.get("metrics", {})
-        if severity == "critical" and (
-            metrics.get("cpu_usage", 0) > 95 or 
-            metrics.get("error_rate", 0) > 0.2
-        ):
-            confidence += 0.1
-            
-        return min(confidence, 1.0)
+        return _classify_alert_data(alert_data)
     
-    def _generate_tags(self, alert_type: str, message: str, services: list, metrics: Dict) -> list[str]:
-        """Generate relevant tags for the incident"""
-        tags = []
-        
-        # Alert type tag
-        if alert_type:
-            tags.append(alert_type)
-            
-        # Service tags
-        for service in services[:3]:  # Limit to first 3 services
-            tags.append(f"service:{service}")
-            
-        # Metric-based tags
-        if metrics.get("cpu_usage", 0) > 90:
-            tags.append("high-cpu")
-        if metrics.get("memory_usage", 0) > 85:
-            tags.append("high-memory")
-        if metrics.get("error_rate", 0) > 0.05:
-            tags.append("high-error-rate")
-        if metrics.get("response_time", 0) > 3000:
-            tags.append("slow-response")
-            
-        # Message-based tags
-        if "backup" in message:
-            tags.append("backup")
-        if "ssl" in message or "certificate" in message:
-            tags.append("security")
-        if "cluster" in message:
-            tags.append("clustering")
-            
-        return tags
-    
-    def _estimate_impact(self, severity: str, services: list, category: str) -> str:
-        """Estimate business impact of the incident"""
-        
-        # Critical services that affect user experience
-        critical_services = ["auth", "api-gateway", "payment", "checkout", "user"]
-        
-        service_criticality = any(
-            any(critical in service.lower() for critical in critical_services)
-            for service in services
-        )
-        
-        if severity == "critical":
-            if service_criticality:
-                return "High - Critical user-facing services affected"
-            else:
-                return "Medium-High - System stability compromised"
-        elif severity == "high":
-            if service_criticality:
-                return "Medium-High - User experience degraded"
-            else:
-                return "Medium - Internal systems affected"
-        elif severity == "medium":
-            if category == "database":
-                return "Medium - Data integrity or availability concerns"
-            else:
-                return "Low-Medium - Limited service impact"
-        else:
-            return "Low - Minimal business impact"
-    
-    def _generate_reasoning(self, category: str, severity: str, confidence: float, metrics: Dict) -> str:
-        """Generate human-readable reasoning for the classification"""
-        
-        reasoning_parts = []
-        
-        # Category reasoning
-        reasoning_parts.append(f"Classified as '{category}' incident based on alert characteristics.")
-        
-        # Severity reasoning
-        if severity == "critical":
-            reasoning_parts.append("Severity elevated to CRITICAL due to:")
-            if metrics.get("cpu_usage", 0) > 95:
-                reasoning_parts.append("- CPU usage exceeding 95%")
-            if metrics.get("error_rate", 0) > 0.2:
-                reasoning_parts.append("- Error rate above 20%")
-        elif severity == "high":
-            reasoning_parts.append("Assessed as HIGH severity due to significant system impact.")
-        
-        # Confidence reasoning
-        if confidence > 0.8:
-            reasoning_parts.append("High confidence classification based on clear indicators.")
-        elif confidence < 0.6:
-            reasoning_parts.append("Moderate confidence - may require manual review.")
-            
-        return " ".join(reasoning_parts)
+    def run_batch(self, alerts: List[Any]) -> List[Dict[str, Any]]:
+        """Classify a burst of alerts in one call.
+        Each entry accepts the same forms as ``alert_data`` in ``run()``; the
+        per-call context unpacking is skipped.
+        """
+        return [_classify_alert_data(alert_data) for alert_data in alerts]
 
 
 # Create the tool instance
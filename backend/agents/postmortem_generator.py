@@ -1,28 +1,131 @@
 """
 Post-Mortem Generator Agent using Portia AI SDK
 """
+import io
 import json
-import sys
-import os
+import re
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Type
-from pydantic import BaseModel, Field
-
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from operator import itemgetter
+from typing import Dict, Any, List, Tuple, Type
+from pydantic import BaseModel, ConfigDict, Field
 
 # Import Portia Tool class
 from portia import Tool, ToolRunContext
 
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the latter
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# Root-cause keywords in priority order; the lookahead also finds overlapping matches
+_CAUSE_KEYWORDS = (
+    ("cpu", "Resource exhaustion"),
+    ("memory", "Resource exhaustion"),
+    ("connection", "Connection pool exhaustion"),
+    ("timeout", "Performance degradation"),
+    ("latency", "Performance degradation"),
+    ("error rate", "Application errors"),
+    ("disk", "Storage capacity issue"),
+    ("storage", "Storage capacity issue"),
+)
+_CAUSE_PRIORITY = {keyword: i for i, (keyword, _) in enumerate(_CAUSE_KEYWORDS)}
+_CAUSE_PATTERN = re.compile(
+    "(?=(" + "|".join(re.escape(keyword) for keyword, _ in _CAUSE_KEYWORDS) + "))", re.IGNORECASE
+)
+
+
+def _parse_ts(value: str) -> datetime:
+    """Parse an ISO-8601 timestamp, accepting a trailing 'Z' for UTC"""
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+# Timeline actors that count as automated: names starting "AI" or containing "Agent"
+_AGENT_RE = re.compile(r'^AI|Agent')
+
+# Contributing-factor rules: (metric, threshold, line format, ratio shown as percent)
+_METRIC_RULES = (
+    ("cpu_usage", 90, "- High CPU usage: {}%\n", False),
+    ("memory_usage", 85, "- High memory usage: {}%\n", False),
+    ("error_rate", 0.05, "- Elevated error rate: {:.1f}%\n", True),
+    ("response_time", 3000, "- Slow response time: {}ms\n", False),
+)
+
+
+class _AlertCtx:
+    """Alert and classification fields read once per run and shared by the helpers"""
+    __slots__ = ('message', 'severity', 'category', 'source_system', 'service_count', 'metrics')
+    
+    def __init__(self, alert: Dict, classification: Dict):
+        self.message = alert.get("message", "")
+        self.severity = classification.get("severity", "unknown")
+        self.category = classification.get("category", "Unknown")
+        self.source_system = alert.get("source_system", "Unknown System")
+        self.service_count = len(alert.get("affected_services", []))
+        self.metrics = alert.get("metrics", {})
+
+
+# Static scaffolding of the markdown report, bound to format_map once at import
+_HEADER_TMPL = """# Post-Incident Report: {title}
+
+**Incident ID:** {incident_id}  
+**Date:** {date}  
+**Status:** {status}  
+
+## Executive Summary
+
+- **Duration:** {duration}
+- **Impact:** {impact}
+- **Root Cause:** {root_cause}
+
+## Timeline
+
+| Time | Event | Details |
+|------|-------|---------|
+""".format_map
+
+_EFFECTIVENESS_TMPL = """
+## Root Cause Analysis
+
+{root_cause}
+
+## Resolution Effectiveness
+
+- **Overall Success:** {overall_success}
+- **Resolution Time:** {resolution_time_minutes} minutes
+- **Automated Actions:** {automated_actions}
+- **Manual Interventions:** {manual_interventions}
+- **Automation Rate:** {automation_rate:.1%}
+
+### Effective Steps
+""".format_map
+
+_APPENDIX_TMPL = """
+## Appendix
+
+This report was automatically generated by the DevOps Crisis Commander Post-Mortem Agent.  
+Generated on: {ts}
+""".format_map
+
+
+# Report models are immutable value objects; unknown keys are dropped, not stored
+_REPORT_MODEL_CONFIG = ConfigDict(extra='ignore', frozen=True, validate_assignment=False)
+
 
 class PostMortemInput(BaseModel):
     """Input schema for post-mortem generation"""
+    model_config = _REPORT_MODEL_CONFIG
+    
     incident_data: Dict[str, Any] = Field(description="Complete incident data and timeline")
     resolution_data: Dict[str, Any] = Field(description="Resolution steps and outcomes")
 
 
 class PostMortemTimelineEntry(BaseModel):
     """Timeline entry for post-mortem"""
+    model_config = _REPORT_MODEL_CONFIG
+    
     time: str = Field(description="Timestamp of event")
     event: str = Field(description="Event description")
     details: str = Field(description="Detailed information")
@@ -31,6 +134,8 @@ class PostMortemTimelineEntry(BaseModel):
 
 class ActionItem(BaseModel):
     """Action item from post-mortem analysis"""
+    model_config = _REPORT_MODEL_CONFIG
+    
     description: str = Field(description="Action item description")
     owner: str = Field(description="Responsible party")
     priority: str = Field(description="Priority level")
@@ -40,6 +145,8 @@ class ActionItem(BaseModel):
 
 class PostMortemOutput(BaseModel):
     """Output schema for post-mortem generation"""
+    model_config = _REPORT_MODEL_CONFIG
+    
     summary: Dict[str, str] = Field(description="Executive summary of incident")
     timeline: List[PostMortemTimelineEntry] = Field(description="Chronological timeline")
     root_cause_analysis: str = Field(description="Root cause analysis")
@@ -69,6 +176,10 @@ class PostMortemGeneratorTool(Tool):
         Generate comprehensive post-mortem report
         """
         try:
+            # One clock reading serves every timestamp in the report
+            now = datetime.now()
+            now_iso = now.isoformat()
+            
             # Get data from context parameters
             incident_data = {}
             resolution_data = {}
@@ -85,12 +196,16 @@ class PostMortemGeneratorTool(Tool):
             # Parse incident data
             if isinstance(incident_data, str):
                 try:
-                    incident = json.loads(incident_data)
+                    incident = _loads(incident_data)
                 except json.JSONDecodeError:
                     incident = {"incident_id": "unknown", "timeline": []}
             else:
                 incident = incident_data
             
+            # Nothing to report on; skip the timeline, analysis and markdown work
+            if not incident or (not incident.get("alert") and not incident.get("timeline")):
+                return self._generate_fallback_postmortem("empty incident data")
+            
             # Extract key information
             incident_id = incident.get("incident_id", "unknown")
             alert_data = incident.get("alert", {})
@@ -100,38 +215,48 @@ class PostMortemGeneratorTool(Tool):
             # Create dummy resolution data for now
             resolution_data = incident.get("resolution_data", {})
             
+            ctx = _AlertCtx(alert_data, classification)
+            
             # Generate timeline
-            timeline = self._reconstruct_timeline(timeline_data, alert_data)
+            timeline = self._reconstruct_timeline(timeline_data, alert_data, now_iso)
             
-            # Convert timeline objects to dictionaries
-            timeline_dict = [entry.dict() for entry in timeline]
+            # Incident span, parsed once and shared by the helpers below
+            duration = _parse_ts(timeline[-1]["time"]) - _parse_ts(timeline[0]["time"])
+            duration_seconds = duration.total_seconds()
+            agent_actions_count = sum(map(itemgetter("agent_action"), timeline))
+            # Everything after the initial alert is either an agent or a manual action
+            manual_actions = len(timeline) - agent_actions_count - 1
+            automation_rate = agent_actions_count / max(len(timeline) - 1, 1)
             
             # Create summary
-            summary = self._generate_summary(incident, resolution_data, timeline)
+            primary_cause = self._extract_primary_cause(ctx, classification)
+            summary = self._generate_summary(ctx, resolution_data, duration, primary_cause)
             
             # Analyze root cause
-            root_cause = self._analyze_root_cause(alert_data, classification, timeline)
+            root_cause = self._analyze_root_cause(ctx, primary_cause, agent_actions_count)
             
             # Evaluate resolution effectiveness
             resolution_effectiveness = self._analyze_resolution_effectiveness(
-                resolution_data, timeline
+                resolution_data, timeline, duration_seconds,
+                agent_actions_count, manual_actions, automation_rate
             )
             
-            # Extract lessons learned
-            lessons_learned = self._extract_lessons_learned(
+            # Extract lessons learned, tagged so action items needn't re-scan the text
+            tagged_lessons = self._extract_lessons_learned(
                 incident, resolution_data, resolution_effectiveness
             )
+            lessons_learned = [text for text, _ in tagged_lessons]
             
             # Generate action items
             action_items = self._generate_action_items(
-                lessons_learned, resolution_effectiveness, classification
+                tagged_lessons, resolution_effectiveness, classification, now
             )
             
-            # Convert action items to dictionaries
-            action_items_dict = [item.dict() for item in action_items]
-            
             # Calculate metrics
-            metrics = self._calculate_incident_metrics(timeline, resolution_data)
+            metrics = self._calculate_incident_metrics(
+                timeline, resolution_data, duration_seconds,
+                agent_actions_count, manual_actions, automation_rate
+            )
             
             # Generate recommendations
             recommendations = self._generate_recommendations(
@@ -141,58 +266,68 @@ class PostMortemGeneratorTool(Tool):
             # Create markdown report
             markdown_report = self._generate_markdown_report(
                 incident_id, summary, timeline, root_cause, resolution_effectiveness,
-                lessons_learned, action_items, metrics, recommendations
+                lessons_learned, action_items, metrics, recommendations, now
             )
             
             return {
                 "incident_id": incident_id,
                 "summary": summary,
-                "timeline": timeline_dict,
+                "timeline": timeline,
                 "root_cause_analysis": root_cause,
                 "resolution_effectiveness": resolution_effectiveness,
                 "lessons_learned": lessons_learned,
-                "action_items": action_items_dict,
+                "action_items": action_items,
                 "metrics": metrics,
                 "recommendations": recommendations,
                 "markdown_report": markdown_report,
-                "generated_at": datetime.now().isoformat()
+                "generated_at": now_iso
             }
             
         except Exception as e:
             return self._generate_fallback_postmortem(str(e))
     
-    def _reconstruct_timeline(self, timeline_data: List[Dict], alert_data: Dict) -> List[PostMortemTimelineEntry]:
-        """Reconstruct chronological timeline of incident"""
+    def _reconstruct_timeline(self, timeline_data: List[Dict], alert_data: Dict, now_iso: str) -> List[Dict[str, Any]]:
+        """
+        Reconstruct chronological timeline of incident
+        Entries are plain dicts shaped like PostMortemTimelineEntry, used as-is in the output
+        """
         timeline = []
         
         # Add initial alert
-        alert_time = alert_data.get("timestamp", datetime.now().isoformat())
-        timeline.append(PostMortemTimelineEntry(
-            time=alert_time,
-            event="Incident Detected",
-            details=f"Alert: {alert_data.get('message', 'Unknown alert')}",
-            agent_action=False
-        ))
+        alert_time = alert_data.get("timestamp", now_iso)
+        timeline.append({
+            "time": alert_time,
+            "event": "Incident Detected",
+            "details": f"Alert: {alert_data.get('message', 'Unknown alert')}",
+            "agent_action": False
+        })
         
         # Add timeline entries from incident data
+        append = timeline.append
+        format_details = self._format_timeline_details
         for entry in timeline_data:
-            timeline.append(PostMortemTimelineEntry(
-                time=entry.get("timestamp", datetime.now().isoformat()),
-                event=entry.get("action", "Unknown action"),
-                details=self._format_timeline_details(entry),
-                agent_action=entry.get("agent", "").startswith("AI") or "Agent" in entry.get("agent", "")
-            ))
-        
-        # Sort by timestamp
-        timeline.sort(key=lambda x: x.time)
+            get = entry.get
+            agent = get("agent", "")
+            append({
+                "time": get("timestamp", now_iso),
+                "event": get("action", "Unknown action"),
+                "details": format_details(entry),
+                "agent_action": bool(agent) and _AGENT_RE.search(agent) is not None
+            })
+        
+        # Sort by timestamp; incident timelines are normally already in order
+        times = [entry["time"] for entry in timeline]
+        if any(later < earlier for earlier, later in zip(times, times[1:])):
+            timeline.sort(key=itemgetter("time"))
         
         return timeline
     
     def _format_timeline_details(self, entry: Dict) -> str:
         """Format timeline entry details"""
-        agent = entry.get("agent", "Unknown")
-        result = entry.get("result", {})
-        duration = entry.get("duration_ms", 0)
+        get = entry.get
+        agent = get("agent", "Unknown")
+        result = get("result", {})
+        duration = get("duration_ms", 0)
         
         details = f"Agent: {agent}"
         if duration:
@@ -206,32 +341,32 @@ class PostMortemGeneratorTool(Tool):
         
         return details
     
-    def _generate_summary(self, incident_data: Dict, resolution_data: Dict, timeline: List) -> Dict[str, str]:
+    def _generate_summary(self, ctx: _AlertCtx, resolution_data: Dict, duration: timedelta,
+                          primary_cause: str) -> Dict[str, str]:
         """Generate executive summary"""
-        alert = incident_data.get("alert", {})
-        classification = incident_data.get("classification", {})
-        
-        # Calculate duration
-        start_time = datetime.fromisoformat(timeline[0].time.replace('Z', '+00:00')) if timeline else datetime.now()
-        end_time = datetime.fromisoformat(timeline[-1].time.replace('Z', '+00:00')) if timeline else start_time
-        duration = end_time - start_time
-        
-        # Determine impact
-        severity = classification.get("severity", "unknown")
-        affected_services = alert.get("affected_services", [])
-        impact = self._assess_impact(severity, affected_services)
+        impact = self._assess_impact(ctx)
+        
+        # H:MM:SS without microseconds; multi-day or negative spans keep timedelta's own form
+        total = int(duration.total_seconds())
+        if 0 <= total < 86400:
+            hours, rest = divmod(total, 3600)
+            minutes, seconds = divmod(rest, 60)
+            duration_str = f"{hours}:{minutes:02d}:{seconds:02d}"
+        else:
+            duration_str = str(duration).split('.')[0]
         
         return {
-            "title": f"{classification.get('category', 'Unknown')} Incident - {alert.get('source_system', 'Unknown System')}",
-            "duration": str(duration).split('.')[0],  # Remove microseconds
+            "title": f"{ctx.category} Incident - {ctx.source_system}",
+            "duration": duration_str,
             "impact": impact,
-            "root_cause": self._extract_primary_cause(alert, classification),
+            "root_cause": primary_cause,
             "status": "Resolved" if resolution_data.get("success", False) else "Ongoing"
         }
     
-    def _assess_impact(self, severity: str, affected_services: List[str]) -> str:
+    def _assess_impact(self, ctx: _AlertCtx) -> str:
         """Assess business impact based on severity and affected services"""
-        service_count = len(affected_services)
+        severity = ctx.severity
+        service_count = ctx.service_count
         
         if severity == "critical":
             if service_count > 3:
@@ -248,29 +383,19 @@ class PostMortemGeneratorTool(Tool):
         else:
             return "Low - Minimal impact"
     
-    def _extract_primary_cause(self, alert: Dict, classification: Dict) -> str:
+    def _extract_primary_cause(self, ctx: _AlertCtx, classification: Dict) -> str:
         """Extract primary root cause from alert and classification"""
-        message = alert.get("message", "").lower()
-        category = classification.get("category", "unknown")
+        matches = _CAUSE_PATTERN.findall(ctx.message)
+        if matches:
+            return _CAUSE_KEYWORDS[min(_CAUSE_PRIORITY[match.lower()] for match in matches)][1]
         
-        if "cpu" in message or "memory" in message:
-            return "Resource exhaustion"
-        elif "connection" in message:
-            return "Connection pool exhaustion"
-        elif "timeout" in message or "latency" in message:
-            return "Performance degradation"
-        elif "error rate" in message:
-            return "Application errors"
-        elif "disk" in message or "storage" in message:
-            return "Storage capacity issue"
-        else:
-            return f"Unknown - requires investigation ({category} related)"
+        category = classification.get("category", "unknown")
+        return f"Unknown - requires investigation ({category} related)"
     
-    def _analyze_root_cause(self, alert: Dict, classification: Dict, timeline: List) -> str:
+    def _analyze_root_cause(self, ctx: _AlertCtx, primary_cause: str, agent_actions_count: int) -> str:
         """Perform detailed root cause analysis"""
-        primary_cause = self._extract_primary_cause(alert, classification)
-        message = alert.get("message", "")
-        metrics = alert.get("metrics", {})
+        message = ctx.message
+        metrics = ctx.metrics
         
         analysis = f"**Primary Cause:** {primary_cause}\n\n"
         analysis += f"**Alert Details:** {message}\n\n"
@@ -278,40 +403,29 @@ class PostMortemGeneratorTool(Tool):
         # Analyze metrics
         if metrics:
             analysis += "**Contributing Factors:**\n"
-            if metrics.get("cpu_usage", 0) > 90:
-                analysis += f"- High CPU usage: {metrics['cpu_usage']}%\n"
-            if metrics.get("memory_usage", 0) > 85:
-                analysis += f"- High memory usage: {metrics['memory_usage']}%\n"
-            if metrics.get("error_rate", 0) > 0.05:
-                analysis += f"- Elevated error rate: {metrics['error_rate']*100:.1f}%\n"
-            if metrics.get("response_time", 0) > 3000:
-                analysis += f"- Slow response time: {metrics['response_time']}ms\n"
+            get = metrics.get
+            for key, threshold, fmt, as_percent in _METRIC_RULES:
+                value = get(key, 0)
+                if value > threshold:
+                    analysis += fmt.format(value * 100 if as_percent else value)
         
         # Analyze timeline for patterns
-        agent_actions = [entry for entry in timeline if entry.agent_action]
-        if agent_actions:
-            analysis += f"\n**Agent Response:** {len(agent_actions)} automated actions taken\n"
+        if agent_actions_count:
+            analysis += f"\n**Agent Response:** {agent_actions_count} automated actions taken\n"
         
         analysis += "\n**Recommendation:** Implement monitoring thresholds and automated scaling to prevent recurrence."
         
         return analysis
     
-    def _analyze_resolution_effectiveness(self, resolution_data: Dict, timeline: List) -> Dict[str, Any]:
+    def _analyze_resolution_effectiveness(self, resolution_data: Dict, timeline: List,
+                                          duration_seconds: float, automated_actions: int,
+                                          manual_actions: int, automation_rate: float) -> Dict[str, Any]:
         """Analyze how effective the resolution was"""
         steps = resolution_data.get("recommended_steps", [])
         success = resolution_data.get("success", False)
         
-        # Count automated vs manual actions
-        automated_actions = sum(1 for entry in timeline if entry.agent_action)
-        manual_actions = len(timeline) - automated_actions - 1  # Subtract initial alert
-        
         # Calculate time to resolution
-        if len(timeline) >= 2:
-            start_time = datetime.fromisoformat(timeline[0].time.replace('Z', '+00:00'))
-            end_time = datetime.fromisoformat(timeline[-1].time.replace('Z', '+00:00'))
-            resolution_time = int((end_time - start_time).total_seconds() / 60)
-        else:
-            resolution_time = 0
+        resolution_time = int(duration_seconds / 60)
         
         effective_steps = []
         ineffective_steps = []
@@ -331,11 +445,12 @@ class PostMortemGeneratorTool(Tool):
             "manual_interventions": manual_actions,
             "effective_steps": effective_steps,
             "ineffective_steps": ineffective_steps,
-            "automation_rate": automated_actions / max(len(timeline) - 1, 1)
+            "automation_rate": automation_rate
         }
     
-    def _extract_lessons_learned(self, incident_data: Dict, resolution_data: Dict, effectiveness: Dict) -> List[str]:
-        """Extract key lessons from the incident"""
+    def _extract_lessons_learned(self, incident_data: Dict, resolution_data: Dict,
+                                 effectiveness: Dict) -> List[Tuple[str, str]]:
+        """Extract key lessons from the incident as (text, tag) pairs"""
         lessons = []
         
         classification = incident_data.get("classification", {})
@@ -343,113 +458,109 @@ class PostMortemGeneratorTool(Tool):
         
         # Classification accuracy lessons
         if confidence < 0.7:
-            lessons.append("Improve alert classification accuracy through better data collection")
+            lessons.append(("Improve alert classification accuracy through better data collection", "classification"))
         
         # Resolution effectiveness lessons
         if effectiveness["automation_rate"] < 0.5:
-            lessons.append("Increase automation for common resolution steps")
+            lessons.append(("Increase automation for common resolution steps", "automation"))
         
         if effectiveness["resolution_time_minutes"] > 30:
-            lessons.append("Optimize response time through better automation and runbook improvements")
+            lessons.append(("Optimize response time through better automation and runbook improvements", "automation"))
         
         if effectiveness["manual_interventions"] > 2:
-            lessons.append("Reduce manual intervention requirements through improved automation")
+            lessons.append(("Reduce manual intervention requirements through improved automation", "automation"))
         
         # Category-specific lessons
         category = classification.get("category", "")
         if category == "database":
-            lessons.append("Consider implementing connection pool monitoring and auto-scaling")
+            lessons.append(("Consider implementing connection pool monitoring and auto-scaling", "monitoring"))
         elif category == "infrastructure":
-            lessons.append("Implement predictive monitoring to catch resource issues earlier")
+            lessons.append(("Implement predictive monitoring to catch resource issues earlier", "monitoring"))
         elif category == "application":
-            lessons.append("Improve application health checks and circuit breaker patterns")
+            lessons.append(("Improve application health checks and circuit breaker patterns", "resilience"))
         
         # Severity-based lessons
         severity = classification.get("severity", "")
         if severity == "critical":
-            lessons.append("Critical incidents require immediate escalation protocols")
+            lessons.append(("Critical incidents require immediate escalation protocols", "process"))
         
         if not lessons:
-            lessons.append("Incident handled effectively - maintain current processes")
+            lessons.append(("Incident handled effectively - maintain current processes", "process"))
         
         return lessons
     
-    def _generate_action_items(self, lessons: List[str], effectiveness: Dict, classification: Dict) -> List[ActionItem]:
-        """Generate actionable follow-up items"""
+    def _generate_action_items(self, lessons: List[Tuple[str, str]], effectiveness: Dict, classification: Dict,
+                               now: datetime) -> List[Dict[str, str]]:
+        """Generate actionable follow-up items, as dicts shaped like ActionItem"""
         action_items = []
         
         # Based on lessons learned
-        for lesson in lessons:
-            if "automation" in lesson.lower():
-                action_items.append(ActionItem(
-                    description="Implement additional automation for identified manual steps",
-                    owner="DevOps Team",
-                    priority="high",
-                    due_date=(datetime.now() + timedelta(days=14)).isoformat(),
-                    category="automation"
-                ))
-            elif "monitoring" in lesson.lower():
-                action_items.append(ActionItem(
-                    description="Enhance monitoring thresholds and alert accuracy",
-                    owner="SRE Team",
-                    priority="medium",
-                    due_date=(datetime.now() + timedelta(days=21)).isoformat(),
-                    category="monitoring"
-                ))
+        for _, tag in lessons:
+            if tag == "automation":
+                action_items.append({
+                    "description": "Implement additional automation for identified manual steps",
+                    "owner": "DevOps Team",
+                    "priority": "high",
+                    "due_date": (now + timedelta(days=14)).isoformat(),
+                    "category": "automation"
+                })
+            elif tag == "monitoring":
+                action_items.append({
+                    "description": "Enhance monitoring thresholds and alert accuracy",
+                    "owner": "SRE Team",
+                    "priority": "medium",
+                    "due_date": (now + timedelta(days=21)).isoformat(),
+                    "category": "monitoring"
+                })
         
         # Based on effectiveness analysis
         if effectiveness["resolution_time_minutes"] > 20:
-            action_items.append(ActionItem(
-                description="Review and optimize incident response runbooks",
-                owner="On-call Team",
-                priority="medium",
-                due_date=(datetime.now() + timedelta(days=10)).isoformat(),
-                category="process"
-            ))
+            action_items.append({
+                "description": "Review and optimize incident response runbooks",
+                "owner": "On-call Team",
+                "priority": "medium",
+                "due_date": (now + timedelta(days=10)).isoformat(),
+                "category": "process"
+            })
         
         # Category-specific actions
         category = classification.get("category", "")
         if category == "database":
-            action_items.append(ActionItem(
-                description="Implement database connection pool monitoring dashboard",
-                owner="Database Team",
-                priority="high",
-                due_date=(datetime.now() + timedelta(days=7)).isoformat(),
-                category="infrastructure"
-            ))
+            action_items.append({
+                "description": "Implement database connection pool monitoring dashboard",
+                "owner": "Database Team",
+                "priority": "high",
+                "due_date": (now + timedelta(days=7)).isoformat(),
+                "category": "infrastructure"
+            })
         
         # Always add documentation action
-        action_items.append(ActionItem(
-            description="Update incident response documentation with lessons learned",
-            owner="Documentation Team",
-            priority="low",
-            due_date=(datetime.now() + timedelta(days=30)).isoformat(),
-            category="documentation"
-        ))
+        action_items.append({
+            "description": "Update incident response documentation with lessons learned",
+            "owner": "Documentation Team",
+            "priority": "low",
+            "due_date": (now + timedelta(days=30)).isoformat(),
+            "category": "documentation"
+        })
         
         return action_items
     
-    def _calculate_incident_metrics(self, timeline: List, resolution_data: Dict) -> Dict[str, Any]:
+    def _calculate_incident_metrics(self, timeline: List, resolution_data: Dict,
+                                    duration_seconds: float, agent_actions: int,
+                                    human_actions: int, automation_rate: float) -> Dict[str, Any]:
         """Calculate key incident metrics"""
         if not timeline:
             return {}
         
         # Time metrics
-        start_time = datetime.fromisoformat(timeline[0].time.replace('Z', '+00:00'))
-        end_time = datetime.fromisoformat(timeline[-1].time.replace('Z', '+00:00'))
-        
-        total_duration = (end_time - start_time).total_seconds() / 60  # minutes
-        
-        # Count different types of actions
-        agent_actions = sum(1 for entry in timeline if entry.agent_action)
-        human_actions = len(timeline) - agent_actions - 1  # Exclude initial alert
+        total_duration = round(duration_seconds / 60, 1)  # minutes
         
         return {
-            "total_duration_minutes": round(total_duration, 1),
-            "mean_time_to_recovery": round(total_duration, 1),
+            "total_duration_minutes": total_duration,
+            "mean_time_to_recovery": total_duration,
             "agent_actions_count": agent_actions,
             "human_actions_count": human_actions,
-            "automation_percentage": round((agent_actions / max(len(timeline) - 1, 1)) * 100, 1),
+            "automation_percentage": round(automation_rate * 100, 1),
             "timeline_entries": len(timeline),
             "resolution_success": resolution_data.get("success", False)
         }
@@ -484,82 +595,50 @@ class PostMortemGeneratorTool(Tool):
     
     def _generate_markdown_report(self, incident_id: str, summary: Dict, timeline: List,
                                  root_cause: str, effectiveness: Dict, lessons: List[str],
-                                 action_items: List, metrics: Dict, recommendations: List[str]) -> str:
+                                 action_items: List, metrics: Dict, recommendations: List[str],
+                                 now: datetime) -> str:
         """Generate complete markdown formatted report"""
+        # Stream fragments into one buffer; repeated += recopies the growing report
+        buf = io.StringIO()
+        add = buf.write
+        now_str = now.strftime('%Y-%m-%d %H:%M:%S')
         
-        report = f"""# Post-Incident Report: {summary['title']}
-
-**Incident ID:** {incident_id}  
-**Date:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  
-**Status:** {summary['status']}  
-
-## Executive Summary
-
-- **Duration:** {summary['duration']}
-- **Impact:** {summary['impact']}
-- **Root Cause:** {summary['root_cause']}
-
-## Timeline
-
-| Time | Event | Details |
-|------|-------|---------|
-"""
+        add(_HEADER_TMPL({**summary, "incident_id": incident_id, "date": now_str}))
         
-        for entry in timeline:
-            agent_indicator = "🤖" if entry.agent_action else "👤"
-            report += f"| {entry.time} | {agent_indicator} {entry.event} | {entry.details} |\n"
+        buf.writelines(
+            f"| {entry['time']} | {'🤖' if entry['agent_action'] else '👤'} {entry['event']} | {entry['details']} |\n"
+            for entry in timeline
+        )
         
-        report += f"""
-## Root Cause Analysis
-
-{root_cause}
-
-## Resolution Effectiveness
-
-- **Overall Success:** {effectiveness['overall_success']}
-- **Resolution Time:** {effectiveness['resolution_time_minutes']} minutes
-- **Automated Actions:** {effectiveness['automated_actions']}
-- **Manual Interventions:** {effectiveness['manual_interventions']}
-- **Automation Rate:** {effectiveness['automation_rate']:.1%}
-
-### Effective Steps
-"""
-        for step in effectiveness.get('effective_steps', []):
-            report += f"- {step}\n"
+        add(_EFFECTIVENESS_TMPL({**effectiveness, "root_cause": root_cause}))
+        buf.writelines(f"- {step}\n" for step in effectiveness.get('effective_steps', []))
         
         if effectiveness.get('ineffective_steps'):
-            report += "\n### Ineffective Steps\n"
-            for step in effectiveness['ineffective_steps']:
-                report += f"- {step}\n"
+            add("\n### Ineffective Steps\n")
+            buf.writelines(f"- {step}\n" for step in effectiveness['ineffective_steps'])
         
-        report += "\n## Lessons Learned\n\n"
-        for lesson in lessons:
-            report += f"- {lesson}\n"
+        add("\n## Lessons Learned\n\n")
+        buf.writelines(f"- {lesson}\n" for lesson in lessons)
         
-        report += "\n## Action Items\n\n"
-        for item in action_items:
-            report += f"- **{item.description}** (Owner: {item.owner}, Priority: {item.priority}, Due: {item.due_date[:10]})\n"
+        add("\n## Action Items\n\n")
+        buf.writelines(
+            f"- **{item['description']}** (Owner: {item['owner']}, Priority: {item['priority']}, Due: {item['due_date'][:10]})\n"
+            for item in action_items
+        )
         
-        report += "\n## Metrics\n\n"
-        for key, value in metrics.items():
-            formatted_key = key.replace('_', ' ').title()
-            report += f"- **{formatted_key}:** {value}\n"
+        add("\n## Metrics\n\n")
+        buf.writelines(f"- **{key.replace('_', ' ').title()}:** {value}\n" for key, value in metrics.items())
         
-        report += "\n## Recommendations\n\n"
-        for rec in recommendations:
-            report += f"- {rec}\n"
+        add("\n## Recommendations\n\n")
+        buf.writelines(f"- {rec}\n" for rec in recommendations)
         
-        report += f"""
-## Appendix
-
-This report was automatically generated by the DevOps Crisis Commander Post-Mortem Agent.  
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-"""
+        add(_APPENDIX_TMPL({"ts": now_str}))
         
-        return report
+        return buf.getvalue()
     
     def _generate_fallback_postmortem(self, error: str) -> Dict[str, Any]:
         """Generate fallback post-mortem when main logic fails"""
+        now_iso = datetime.now().isoformat()
         return {
             "incident_id": "unknown",
             "summary": {
@@ -571,7 +650,7 @@ Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             },
             "timeline": [
                 {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now_iso,
                     "event": "Post-mortem generation failed",
                     "actor": "postmortem_generator",
                     "description": f"Error occurred: {error}"
@@ -584,7 +663,7 @@ Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
             "metrics": {},
             "recommendations": ["Investigate post-mortem generation failure"],
             "markdown_report": f"# Post-Mortem Generation Error\\n\\nError: {error}\\n\\nManual review required.",
-            "generated_at": datetime.now().isoformat()
+            "generated_at": now_iso
         }
 
 
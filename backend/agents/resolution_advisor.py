@@ -1,20 +1,59 @@
 """
 Resolution Advisor Agent using Portia AI SDK
 """
+import functools
 import json
+import re
 import sys
-import os
+import time
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, Any, List, Type
+from types import MappingProxyType
+from typing import Callable, Dict, Any, List, Mapping, Optional, Sequence, Tuple, Type
 from pydantic import BaseModel, Field
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.models import Classification, Runbook
 
 # Import Portia Tool class
 from portia import Tool, ToolRunContext
 
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the latter
+try:
+    from orjson import loads as _loads
+except ImportError:
+    from json import loads as _loads
+
+# Reasoning sentences kept, keyed by plan shape and probability band
+REASONING_CACHE_SIZE = 1024
+
+# How long a formatted generated_at timestamp is reused across bursts of advisories
+TIMESTAMP_REUSE_SECONDS = 0.25
+
+# Specialized planners kept per tool instance, keyed by (category, severity)
+PLAN_CACHE_SIZE = 256
+
+# Step description keywords, labelled in one scan; the lookahead keeps overlapping matches
+_STEP_KEYWORDS = re.compile(r"(?=(?P<monitor>monitor)|(?P<investigation>check|analyze|review))", re.IGNORECASE)
+# Commands that touch the database ("pg_" is matched case-sensitively, as before)
+_DB_COMMAND = re.compile(r"(?i:database)|pg_")
+
+# Context attributes (or kwargs keys) that may carry the classification, in priority order
+_CLASSIFICATION_KEYS = ('classification_data', 'classification', 'input', 'inputs')
+_NO_KWARGS: Mapping[str, Any] = MappingProxyType({})
+
+# General rollback guidance for plans without step-level rollback commands
+_GENERIC_ROLLBACK = (
+    "No specific rollback commands available",
+    "Monitor system state and manually revert changes if needed",
+    "Restore from backup if system state is compromised"
+)
+
+# Severities whose generic plan adds an on-call escalation step
+_ESCALATION_SEVERITIES = frozenset({"critical", "high"})
+
+# Runbook categories that also match "infrastructure" incidents
+_INFRASTRUCTURE_SUBCATEGORIES = frozenset({"cpu", "memory", "disk"})
+
 
 class ResolutionInput(BaseModel):
     """Input schema for resolution advisory"""
@@ -22,15 +61,28 @@ class ResolutionInput(BaseModel):
     incident_context: Dict[str, Any] = Field(description="Additional incident context")
 
 
-class ResolutionStep(BaseModel):
+@dataclass(slots=True, frozen=True, kw_only=True)
+class ResolutionStep:
     """Individual resolution step"""
-    step_number: int = Field(description="Step sequence number")
-    description: str = Field(description="Step description")
-    command: str = Field(description="Command to execute", default="")
-    expected_result: str = Field(description="Expected outcome")
-    automation_possible: bool = Field(description="Whether step can be automated")
-    risk_level: str = Field(description="Risk level: low, medium, high")
-    rollback_command: str = Field(description="Rollback command if needed", default="")
+    step_number: int  # Step sequence number
+    description: str  # Step description
+    command: str = ""  # Command to execute
+    expected_result: str  # Expected outcome
+    automation_possible: bool = False  # Whether step can be automated
+    risk_level: str = "medium"  # Risk level: low, medium, high
+    rollback_command: str = ""  # Rollback command if needed
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain dict in field order, without dataclasses.asdict introspection"""
+        return {
+            "step_number": self.step_number,
+            "description": self.description,
+            "command": self.command,
+            "expected_result": self.expected_result,
+            "automation_possible": self.automation_possible,
+            "risk_level": self.risk_level,
+            "rollback_command": self.rollback_command,
+        }
 
 
 class ResolutionOutput(BaseModel):
@@ -45,6 +97,358 @@ class ResolutionOutput(BaseModel):
     reasoning: str = Field(description="Explanation of recommended approach")
 
 
+@dataclass(slots=True)
+class StepStats:
+    """Per-plan step facts gathered in a single pass"""
+    step_count: int = 0
+    manual_count: int = 0
+    has_high_risk: bool = False
+    has_db_op: bool = False
+    monitor_count: int = 0
+    investigation_count: int = 0
+
+
+@dataclass(slots=True, frozen=True)
+class StepColumns:
+    """Column-wise (struct-of-arrays) view of a step list for whole-column checks"""
+    step_numbers: Tuple[int, ...]
+    automation: Tuple[bool, ...]
+    risk_levels: Tuple[str, ...]
+    rollback_commands: Tuple[str, ...]
+    # Keyword flags, so each description/command is scanned once when the columns are built
+    db_operations: Tuple[bool, ...]
+    monitoring: Tuple[bool, ...]
+    investigation: Tuple[bool, ...]
+    
+    @classmethod
+    def from_steps(cls, steps: Sequence[Mapping[str, Any]]) -> "StepColumns":
+        """Split normalized step dicts into per-field tuples"""
+        labels = [{match.lastgroup for match in _STEP_KEYWORDS.finditer(step["description"])} for step in steps]
+        return cls(
+            step_numbers=tuple(step["step_number"] for step in steps),
+            automation=tuple(bool(step["automation_possible"]) for step in steps),
+            risk_levels=tuple(step["risk_level"] for step in steps),
+            rollback_commands=tuple(step["rollback_command"] for step in steps),
+            db_operations=tuple(_DB_COMMAND.search(step["command"]) is not None for step in steps),
+            monitoring=tuple("monitor" in step_labels for step_labels in labels),
+            investigation=tuple("investigation" in step_labels for step_labels in labels),
+        )
+
+
+# Last formatted timestamp as (monotonic time, ISO string); swapped as one tuple so readers
+# never see a torn pair, and a racing refresh just writes an equally valid value
+_last_timestamp: Tuple[float, str] = (float("-inf"), "")
+
+
+def _now_iso() -> str:
+    """Current local time in ISO format, reused for up to TIMESTAMP_REUSE_SECONDS"""
+    global _last_timestamp
+    now = time.monotonic()
+    stamped_at, iso = _last_timestamp
+    if now - stamped_at < TIMESTAMP_REUSE_SECONDS:
+        return iso
+    iso = datetime.now().isoformat()
+    _last_timestamp = (now, iso)
+    return iso
+
+
+def _intern(value: Any) -> Any:
+    """
+    Intern classification strings so equality checks and cache keys hit the identity fast path
+    Unhashable values (e.g. a list from an LLM) become their str(): they never match a
+    runbook and are only ever formatted, so the plan comes out the same
+    """
+    if type(value) is str:
+        return sys.intern(value)
+    try:
+        hash(value)
+    except TypeError:
+        return str(value)
+    return value
+
+
+def _normalize_step(step_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Complete a step with ResolutionStep's defaults, in its field order"""
+    return ResolutionStep(**step_data).as_dict()
+
+
+def _build_rollback_plan(columns: StepColumns) -> Tuple[str, ...]:
+    """Rollback commands last step first, or general guidance when there are none"""
+    commands = [
+        f"Step {number} rollback: {command}"
+        for number, command in zip(reversed(columns.step_numbers), reversed(columns.rollback_commands))
+        if command
+    ]
+    if not commands:
+        return _GENERIC_ROLLBACK
+    return ("Execute rollback commands in the following order:", *commands)
+
+
+# Bit assigned to each distinct prerequisite, in first-seen order
+_PREREQUISITE_BITS: Dict[str, int] = {}
+
+
+def _prerequisite_mask(names: Sequence[str]) -> int:
+    """Encode prerequisite names as a bitmask, assigning new bits as names appear"""
+    mask = 0
+    for name in names:
+        bit = _PREREQUISITE_BITS.get(name)
+        if bit is None:
+            bit = _PREREQUISITE_BITS[name] = 1 << len(_PREREQUISITE_BITS)
+        mask |= bit
+    return mask
+
+
+@functools.lru_cache(maxsize=None)
+def _prerequisites_for_mask(mask: int) -> Tuple[str, ...]:
+    """Decode a prerequisite bitmask back to names, in bit order"""
+    return tuple(name for name, bit in _PREREQUISITE_BITS.items() if mask & bit)
+
+
+@functools.lru_cache(maxsize=REASONING_CACHE_SIZE, typed=True)
+def _reasoning_text(category: str, severity: str, runbook_count: int, probability_band: Optional[str]) -> str:
+    """Build the reasoning sentence for one plan shape and success-probability band"""
+    reasoning_parts = []
+    
+    reasoning_parts.append(f"Resolution approach selected for {category} incident with {severity} severity.")
+    
+    if runbook_count > 0:
+        reasoning_parts.append(f"Matched {runbook_count} proven runbook(s) for this incident type.")
+    else:
+        reasoning_parts.append("No specific runbooks matched - using generic resolution approach.")
+    
+    if probability_band == "high":
+        reasoning_parts.append("High probability of successful resolution based on historical data.")
+    elif probability_band == "low":
+        reasoning_parts.append("Moderate success probability - consider escalation if initial steps fail.")
+    
+    if severity == "critical":
+        reasoning_parts.append("Critical severity requires immediate action and human oversight.")
+    
+    return " ".join(reasoning_parts)
+
+
+def _freeze_runbook(runbook: Dict[str, Any]) -> MappingProxyType:
+    """Wrap a runbook literal as a read-only mapping with tuple sequences"""
+    steps = tuple(MappingProxyType(_normalize_step(step)) for step in runbook["steps"])
+    columns = StepColumns.from_steps(steps)
+    return MappingProxyType({
+        **runbook,
+        "severity_levels": tuple(runbook["severity_levels"]),
+        "prerequisites": tuple(runbook.get("prerequisites", ())),
+        "prerequisite_mask": _prerequisite_mask(runbook.get("prerequisites", ())),
+        "steps": steps,
+        "step_columns": columns,
+        "rollback_plan": _build_rollback_plan(columns),
+    })
+
+
+# Runbook database (in production this would be loaded from a database);
+# static, so built once per process and shared read-only by every tool instance
+_RUNBOOK_DB = tuple(map(_freeze_runbook, [
+    {
+        "category": "infrastructure",
+        "severity_levels": ["critical", "high"],
+        "title": "High CPU Usage Resolution",
+        "steps": [
+            {
+                "step_number": 1,
+                "description": "Identify top CPU consuming processes",
+                "command": "top -o %CPU | head -10",
+                "expected_result": "List of processes sorted by CPU usage",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 2,
+                "description": "Check system load and resource allocation",
+                "command": "uptime && free -h && df -h",
+                "expected_result": "System resource overview",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 3,
+                "description": "Scale horizontally if using container orchestration",
+                "command": "kubectl scale deployment [service-name] --replicas=5",
+                "expected_result": "Additional instances created",
+                "automation_possible": True,
+                "risk_level": "medium",
+                "rollback_command": "kubectl scale deployment [service-name] --replicas=3"
+            },
+            {
+                "step_number": 4,
+                "description": "Monitor CPU usage stabilization",
+                "command": "Monitor for 5 minutes",
+                "expected_result": "CPU usage below 80%",
+                "automation_possible": False,
+                "risk_level": "low"
+            }
+        ],
+        "prerequisites": ["kubectl access", "monitoring access"],
+        "estimated_time": 15,
+        "success_rate": 0.85
+    },
+    {
+        "category": "database",
+        "severity_levels": ["critical", "high"],
+        "title": "Database Connection Pool Exhaustion",
+        "steps": [
+            {
+                "step_number": 1,
+                "description": "Check current connection count",
+                "command": "SELECT count(*) FROM pg_stat_activity;",
+                "expected_result": "Current active connections",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 2,
+                "description": "Identify long-running queries",
+                "command": "SELECT query, state, query_start FROM pg_stat_activity WHERE state != 'idle' ORDER BY query_start;",
+                "expected_result": "List of active queries",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 3,
+                "description": "Terminate problematic connections",
+                "command": "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE query_start < now() - interval '30 minutes';",
+                "expected_result": "Long-running connections terminated",
+                "automation_possible": False,
+                "risk_level": "high"
+            },
+            {
+                "step_number": 4,
+                "description": "Restart application connection pools",
+                "command": "kubectl rollout restart deployment [app-name]",
+                "expected_result": "Fresh connection pools",
+                "automation_possible": True,
+                "risk_level": "medium"
+            }
+        ],
+        "prerequisites": ["database admin access", "kubectl access"],
+        "estimated_time": 10,
+        "success_rate": 0.92
+    },
+    {
+        "category": "application",
+        "severity_levels": ["critical", "high"],
+        "title": "Application Error Rate Resolution",
+        "steps": [
+            {
+                "step_number": 1,
+                "description": "Check application logs for error patterns",
+                "command": "kubectl logs -l app=[service-name] --tail=100 | grep ERROR",
+                "expected_result": "Recent error log entries",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 2,
+                "description": "Verify service health endpoints",
+                "command": "curl -f http://[service]/health",
+                "expected_result": "Health check returns 200 OK",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 3,
+                "description": "Restart affected service pods",
+                "command": "kubectl rollout restart deployment [service-name]",
+                "expected_result": "Service pods restarted successfully",
+                "automation_possible": True,
+                "risk_level": "medium"
+            },
+            {
+                "step_number": 4,
+                "description": "Monitor error rate recovery",
+                "command": "Monitor error metrics for 10 minutes",
+                "expected_result": "Error rate returns to baseline",
+                "automation_possible": False,
+                "risk_level": "low"
+            }
+        ],
+        "prerequisites": ["kubectl access", "service logs access"],
+        "estimated_time": 12,
+        "success_rate": 0.78
+    },
+    {
+        "category": "network",
+        "severity_levels": ["high", "medium"],
+        "title": "Network Latency Resolution",
+        "steps": [
+            {
+                "step_number": 1,
+                "description": "Test network connectivity and latency",
+                "command": "ping -c 10 [target-host] && traceroute [target-host]",
+                "expected_result": "Network path analysis",
+                "automation_possible": True,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 2,
+                "description": "Check load balancer health",
+                "command": "Check load balancer status and backend health",
+                "expected_result": "All backends healthy",
+                "automation_possible": False,
+                "risk_level": "low"
+            },
+            {
+                "step_number": 3,
+                "description": "Enable CDN or adjust routing",
+                "command": "Update CDN configuration or DNS routing",
+                "expected_result": "Traffic optimized through best path",
+                "automation_possible": False,
+                "risk_level": "medium"
+            }
+        ],
+        "prerequisites": ["network admin access", "CDN access"],
+        "estimated_time": 8,
+        "success_rate": 0.88
+    }
+]))
+
+# Extra prerequisites implied by the incident category
+_CATEGORY_PREREQUISITE_MASKS = {
+    "database": _prerequisite_mask(["database admin access"]),
+    "infrastructure": _prerequisite_mask(["system admin access"]),
+    "application": _prerequisite_mask(["kubectl access"]),
+}
+
+
+# Invariant part of the fallback resolution; only reasoning and generated_at vary per call
+_FALLBACK_TEMPLATE: Mapping[str, Any] = MappingProxyType({
+    "incident_id": "unknown",
+    "recommended_steps": (
+        MappingProxyType({
+            "step_number": 1,
+            "description": "Manual investigation required",
+            "command": "Review all available data sources",
+            "expected_result": "Understanding of incident scope",
+            "automation_possible": False,
+            "risk_level": "low"
+        }),
+        MappingProxyType({
+            "step_number": 2,
+            "description": "Escalate to senior engineer",
+            "command": "Contact on-call senior engineer",
+            "expected_result": "Expert assistance engaged",
+            "automation_possible": False,
+            "risk_level": "low"
+        }),
+    ),
+    "estimated_time_minutes": 60,
+    "success_probability": 0.8,
+    "human_approval_required": True,
+    "parallel_actions": (),
+    "rollback_plan": "No automated rollback available - manual intervention required",
+    "prerequisites": ("Access to monitoring systems", "Contact information for senior engineer"),
+    "reasoning": "",
+    "generated_at": "",
+})
+
+
 class ResolutionAdvisorTool(Tool):
     """Tool for providing contextual resolution guidance"""
     
@@ -61,10 +465,33 @@ class ResolutionAdvisorTool(Tool):
     
     def __init__(self):
         super().__init__()
-        # Initialize runbooks - storing as instance data
-        self._runbooks = self._load_runbooks()
+        # Runbooks are shared module data, not rebuilt per instance
+        self._runbooks = _RUNBOOK_DB
         # Use object.__setattr__ to bypass Pydantic validation
         object.__setattr__(self, 'runbook_db', self._runbooks)
+        
+        # Index runbooks by (category, severity) and by severity alone, in load order
+        index: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        severity_index: Dict[str, List[Dict[str, Any]]] = {}
+        for runbook in self._runbooks:
+            categories = [runbook["category"]]
+            if runbook["category"] in _INFRASTRUCTURE_SUBCATEGORIES:
+                categories.append("infrastructure")
+            for severity in runbook["severity_levels"]:
+                for category in categories:
+                    index.setdefault((category, severity), []).append(runbook)
+                severity_index.setdefault(severity, []).append(runbook)
+        object.__setattr__(self, '_index', index)
+        object.__setattr__(self, '_severity_index', severity_index)
+        
+        # Per-instance planner cache; typed so e.g. category 5 and 5.0 stay distinct
+        object.__setattr__(
+            self, '_plan', functools.lru_cache(maxsize=PLAN_CACHE_SIZE, typed=True)(self._build_plan)
+        )
+        
+        # Warm the planners for every runbook-backed key so a fresh worker serves them without a miss
+        for category, severity in index:
+            self._plan(category, severity)
     
     def run(self, context: ToolRunContext = None) -> Dict[str, Any]:
         """
@@ -76,24 +503,27 @@ class ResolutionAdvisorTool(Tool):
             incident_context = {}
             
             if context is not None:
+                # Resolve the kwargs fallback once rather than per candidate key
+                kwargs = getattr(context, 'kwargs', None)
+                if not isinstance(kwargs, dict):
+                    kwargs = _NO_KWARGS
+                
                 # Try various ways to extract classification data
-                for key in ('classification_data', 'classification', 'input', 'inputs'):
+                for key in _CLASSIFICATION_KEYS:
                     value = getattr(context, key, None)
-                    if value is None and hasattr(context, 'kwargs') and isinstance(context.kwargs, dict):
-                        value = context.kwargs.get(key)
+                    if value is None:
+                        value = kwargs.get(key)
                     if value is not None:
                         classification_data = value
                         break
                 
                 # Try to get incident context
-                incident_context = getattr(context, 'incident_context', {})
-                if not incident_context and hasattr(context, 'kwargs') and isinstance(context.kwargs, dict):
-                    incident_context = context.kwargs.get('incident_context', {})
+                incident_context = getattr(context, 'incident_context', {}) or kwargs.get('incident_context', {})
             
             # Parse classification data
             if isinstance(classification_data, str):
                 try:
-                    classification = json.loads(classification_data)
+                    classification = _loads(classification_data)
                 except json.JSONDecodeError:
                     classification = {"category": "unknown", "severity": "medium"}
             elif isinstance(classification_data, dict):
@@ -103,272 +533,84 @@ class ResolutionAdvisorTool(Tool):
             else:
                 classification = {"category": "unknown", "severity": "medium"}
             
-            category = classification.get("category", "unknown")
-            severity = classification.get("severity", "medium")
+            category = _intern(classification.get("category", "unknown"))
+            severity = _intern(classification.get("severity", "medium"))
             confidence = classification.get("confidence", 0.5)
             
-            # Create empty incident context for now
-            incident_context = {}
-            
-            # Find matching runbooks
-            matched_runbooks = self._find_matching_runbooks(category, severity)
-            
-            # Generate resolution steps
-            resolution_steps = self._generate_resolution_steps(
-                matched_runbooks, classification, incident_context
-            )
-            
-            # Convert ResolutionStep objects to dictionaries
-            resolution_steps_dict = [step.dict() for step in resolution_steps]
-            
-            # Calculate estimates
-            estimated_time = self._estimate_resolution_time(resolution_steps, severity)
-            success_probability = self._calculate_success_probability(
-                matched_runbooks, confidence, severity
-            )
-            
-            # Determine approval requirements
-            human_approval = self._requires_human_approval(resolution_steps, severity)
-            
-            # Generate parallel actions
-            parallel_actions = self._identify_parallel_actions(resolution_steps)
-            
-            # Create rollback plan
-            rollback_plan = self._generate_rollback_plan(resolution_steps)
-            
-            # Gather prerequisites
-            prerequisites = self._gather_prerequisites(matched_runbooks, category)
-            
-            # Generate reasoning
-            reasoning = self._generate_reasoning(
-                category, severity, len(matched_runbooks), success_probability
-            )
-            
-            return {
-                "incident_id": classification.get("incident_id", "unknown"),
-                "recommended_steps": resolution_steps_dict,
-                "estimated_time_minutes": estimated_time,
-                "success_probability": success_probability,
-                "human_approval_required": human_approval,
-                "parallel_actions": parallel_actions,
-                "rollback_plan": rollback_plan,
-                "prerequisites": prerequisites,
-                "reasoning": reasoning,
-                "generated_at": datetime.now().isoformat()
-            }
+            # Planners are specialized once per (category, severity); only confidence varies per call
+            planner = self._plan(category, severity)
+            return planner(classification.get("incident_id", "unknown"), confidence)
             
         except Exception as e:
             # Fallback resolution
             return self._generate_fallback_resolution(str(e))
     
-    def _load_runbooks(self) -> List[Dict[str, Any]]:
-        """Load runbook database (in production this would be from a database)"""
-        return [
-            {
-                "category": "infrastructure",
-                "severity_levels": ["critical", "high"],
-                "title": "High CPU Usage Resolution",
-                "steps": [
-                    {
-                        "step_number": 1,
-                        "description": "Identify top CPU consuming processes",
-                        "command": "top -o %CPU | head -10",
-                        "expected_result": "List of processes sorted by CPU usage",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 2,
-                        "description": "Check system load and resource allocation",
-                        "command": "uptime && free -h && df -h",
-                        "expected_result": "System resource overview",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 3,
-                        "description": "Scale horizontally if using container orchestration",
-                        "command": "kubectl scale deployment [service-name] --replicas=5",
-                        "expected_result": "Additional instances created",
-                        "automation_possible": True,
-                        "risk_level": "medium",
-                        "rollback_command": "kubectl scale deployment [service-name] --replicas=3"
-                    },
-                    {
-                        "step_number": 4,
-                        "description": "Monitor CPU usage stabilization",
-                        "command": "Monitor for 5 minutes",
-                        "expected_result": "CPU usage below 80%",
-                        "automation_possible": False,
-                        "risk_level": "low"
-                    }
-                ],
-                "prerequisites": ["kubectl access", "monitoring access"],
-                "estimated_time": 15,
-                "success_rate": 0.85
-            },
-            {
-                "category": "database",
-                "severity_levels": ["critical", "high"],
-                "title": "Database Connection Pool Exhaustion",
-                "steps": [
-                    {
-                        "step_number": 1,
-                        "description": "Check current connection count",
-                        "command": "SELECT count(*) FROM pg_stat_activity;",
-                        "expected_result": "Current active connections",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 2,
-                        "description": "Identify long-running queries",
-                        "command": "SELECT query, state, query_start FROM pg_stat_activity WHERE state != 'idle' ORDER BY query_start;",
-                        "expected_result": "List of active queries",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 3,
-                        "description": "Terminate problematic connections",
-                        "command": "SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE query_start < now() - interval '30 minutes';",
-                        "expected_result": "Long-running connections terminated",
-                        "automation_possible": False,
-                        "risk_level": "high"
-                    },
-                    {
-                        "step_number": 4,
-                        "description": "Restart application connection pools",
-                        "command": "kubectl rollout restart deployment [app-name]",
-                        "expected_result": "Fresh connection pools",
-                        "automation_possible": True,
-                        "risk_level": "medium"
-                    }
-                ],
-                "prerequisites": ["database admin access", "kubectl access"],
-                "estimated_time": 10,
-                "success_rate": 0.92
-            },
-            {
-                "category": "application",
-                "severity_levels": ["critical", "high"],
-                "title": "Application Error Rate Resolution",
-                "steps": [
-                    {
-                        "step_number": 1,
-                        "description": "Check application logs for error patterns",
-                        "command": "kubectl logs -l app=[service-name] --tail=100 | grep ERROR",
-                        "expected_result": "Recent error log entries",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 2,
-                        "description": "Verify service health endpoints",
-                        "command": "curl -f http://[service]/health",
-                        "expected_result": "Health check returns 200 OK",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 3,
-                        "description": "Restart affected service pods",
-                        "command": "kubectl rollout restart deployment [service-name]",
-                        "expected_result": "Service pods restarted successfully",
-                        "automation_possible": True,
-                        "risk_level": "medium"
-                    },
-                    {
-                        "step_number": 4,
-                        "description": "Monitor error rate recovery",
-                        "command": "Monitor error metrics for 10 minutes",
-                        "expected_result": "Error rate returns to baseline",
-                        "automation_possible": False,
-                        "risk_level": "low"
-                    }
-                ],
-                "prerequisites": ["kubectl access", "service logs access"],
-                "estimated_time": 12,
-                "success_rate": 0.78
-            },
-            {
-                "category": "network",
-                "severity_levels": ["high", "medium"],
-                "title": "Network Latency Resolution",
-                "steps": [
-                    {
-                        "step_number": 1,
-                        "description": "Test network connectivity and latency",
-                        "command": "ping -c 10 [target-host] && traceroute [target-host]",
-                        "expected_result": "Network path analysis",
-                        "automation_possible": True,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 2,
-                        "description": "Check load balancer health",
-                        "command": "Check load balancer status and backend health",
-                        "expected_result": "All backends healthy",
-                        "automation_possible": False,
-                        "risk_level": "low"
-                    },
-                    {
-                        "step_number": 3,
-                        "description": "Enable CDN or adjust routing",
-                        "command": "Update CDN configuration or DNS routing",
-                        "expected_result": "Traffic optimized through best path",
-                        "automation_possible": False,
-                        "risk_level": "medium"
-                    }
-                ],
-                "prerequisites": ["network admin access", "CDN access"],
-                "estimated_time": 8,
-                "success_rate": 0.88
+    def _build_plan(self, category: str, severity: str) -> Callable[[Any, float], Dict[str, Any]]:
+        """Specialize a planner for one (category, severity) with everything else precomputed"""
+        # Find matching runbooks
+        matched_runbooks = self._find_matching_runbooks(category, severity)
+        
+        # Generate resolution steps
+        steps = tuple(self._generate_resolution_steps(
+            matched_runbooks, {"category": category, "severity": severity}, {}
+        ))
+        
+        # Runbooks carry prebuilt columns; only generic steps need splitting here
+        if matched_runbooks:
+            columns = matched_runbooks[0]["step_columns"]
+        else:
+            columns = StepColumns.from_steps(steps)
+        step_stats = self._analyze_steps(columns)
+        
+        runbook_count = len(matched_runbooks)
+        avg_success_rate = self._average_success_rate(matched_runbooks)
+        estimated_time = self._estimate_resolution_time(step_stats, severity)
+        human_approval = self._requires_human_approval(step_stats, severity)
+        parallel_actions = tuple(self._identify_parallel_actions(step_stats))
+        # Runbook rollback plans are prebuilt at load time
+        if matched_runbooks:
+            rollback_plan = matched_runbooks[0]["rollback_plan"]
+        else:
+            rollback_plan = self._generate_rollback_plan(columns)
+        prerequisites = tuple(self._gather_prerequisites(matched_runbooks, category))
+        calculate_success_probability = self._calculate_success_probability
+        generate_reasoning = self._generate_reasoning
+        
+        def planner(incident_id: Any, confidence: float) -> Dict[str, Any]:
+            success_probability = calculate_success_probability(avg_success_rate, confidence, severity)
+            return {
+                "incident_id": incident_id,
+                # Fresh containers so callers can't mutate the shared plan
+                "recommended_steps": [dict(step) for step in steps],
+                "estimated_time_minutes": estimated_time,
+                "success_probability": success_probability,
+                "human_approval_required": human_approval,
+                "parallel_actions": list(parallel_actions),
+                "rollback_plan": list(rollback_plan),
+                "prerequisites": list(prerequisites),
+                "reasoning": generate_reasoning(category, severity, runbook_count, success_probability),
+                "generated_at": _now_iso()
             }
-        ]
+        
+        return planner
     
     def _find_matching_runbooks(self, category: str, severity: str) -> List[Dict[str, Any]]:
         """Find runbooks that match the incident category and severity"""
-        matched = []
-        
-        for runbook in self.runbook_db:
-            if (runbook["category"] == category or 
-                category == "infrastructure" and runbook["category"] in ["cpu", "memory", "disk"]):
-                if severity in runbook["severity_levels"]:
-                    matched.append(runbook)
-        
-        # If no exact match, find similar categories
-        if not matched:
-            for runbook in self.runbook_db:
-                if severity in runbook["severity_levels"]:
-                    matched.append(runbook)
+        # If no exact match, fall back to any runbook covering the severity
+        matched = self._index.get((category, severity)) or self._severity_index.get(severity, [])
         
         return matched[:2]  # Limit to top 2 matches
     
-    def _generate_resolution_steps(self, runbooks: List[Dict], classification: Dict, context: Dict) -> List[ResolutionStep]:
+    def _generate_resolution_steps(self, runbooks: List[Dict], classification: Dict,
+                                   context: Dict) -> Sequence[Mapping[str, Any]]:
         """Generate detailed resolution steps based on matched runbooks"""
         if not runbooks:
             return self._generate_generic_steps(classification)
         
-        # Use the best matching runbook
-        primary_runbook = runbooks[0]
-        steps = []
-        
-        for step_data in primary_runbook["steps"]:
-            step = ResolutionStep(
-                step_number=step_data["step_number"],
-                description=step_data["description"],
-                command=step_data.get("command", ""),
-                expected_result=step_data["expected_result"],
-                automation_possible=step_data.get("automation_possible", False),
-                risk_level=step_data.get("risk_level", "medium"),
-                rollback_command=step_data.get("rollback_command", "")
-            )
-            steps.append(step)
-        
-        return steps
+        # Use the best matching runbook; its steps were normalized at load time
+        return runbooks[0]["steps"]
     
-    def _generate_generic_steps(self, classification: Dict) -> List[ResolutionStep]:
+    def _generate_generic_steps(self, classification: Dict) -> List[Dict[str, Any]]:
         """Generate generic resolution steps when no specific runbook matches"""
         severity = classification.get("severity", "medium")
         category = classification.get("category", "unknown")
@@ -381,7 +623,7 @@ class ResolutionAdvisorTool(Tool):
                 expected_result="Root cause identified",
                 automation_possible=False,
                 risk_level="low"
-            ),
+            ).as_dict(),
             ResolutionStep(
                 step_number=2,
                 description="Apply immediate mitigation if available",
@@ -389,10 +631,10 @@ class ResolutionAdvisorTool(Tool):
                 expected_result="Incident impact reduced",
                 automation_possible=False,
                 risk_level="medium"
-            )
+            ).as_dict()
         ]
         
-        if severity in ["critical", "high"]:
+        if severity in _ESCALATION_SEVERITIES:
             steps.append(ResolutionStep(
                 step_number=3,
                 description="Escalate to on-call engineer",
@@ -400,13 +642,24 @@ class ResolutionAdvisorTool(Tool):
                 expected_result="Expert engaged for resolution",
                 automation_possible=True,
                 risk_level="low"
-            ))
+            ).as_dict())
         
         return steps
     
-    def _estimate_resolution_time(self, steps: List[ResolutionStep], severity: str) -> int:
+    def _analyze_steps(self, columns: StepColumns) -> StepStats:
+        """Collect counts and risk flags from the step columns"""
+        return StepStats(
+            step_count=len(columns.step_numbers),
+            manual_count=columns.automation.count(False),
+            has_high_risk="high" in columns.risk_levels,
+            has_db_op=True in columns.db_operations,
+            monitor_count=columns.monitoring.count(True),
+            investigation_count=columns.investigation.count(True),
+        )
+    
+    def _estimate_resolution_time(self, stats: StepStats, severity: str) -> int:
         """Estimate total resolution time in minutes"""
-        base_time = len(steps) * 3  # 3 minutes per step base
+        base_time = stats.step_count * 3  # 3 minutes per step base
         
         # Adjust based on severity
         if severity == "critical":
@@ -415,19 +668,22 @@ class ResolutionAdvisorTool(Tool):
             base_time *= 0.8
         
         # Add time for manual steps
-        manual_steps = sum(1 for step in steps if not step.automation_possible)
-        base_time += manual_steps * 2
+        base_time += stats.manual_count * 2
         
         return max(int(base_time), 5)  # Minimum 5 minutes
     
-    def _calculate_success_probability(self, runbooks: List[Dict], confidence: float, severity: str) -> float:
-        """Calculate probability of successful resolution"""
+    def _average_success_rate(self, runbooks: List[Dict]) -> Optional[float]:
+        """Average success rate of the matched runbooks, or None when nothing matched"""
         if not runbooks:
+            return None
+        return sum(rb.get("success_rate", 0.7) for rb in runbooks) / len(runbooks)
+    
+    def _calculate_success_probability(self, avg_success_rate: Optional[float], confidence: float,
+                                       severity: str) -> float:
+        """Calculate probability of successful resolution"""
+        if avg_success_rate is None:
             return 0.6  # Default probability for generic approach
         
-        # Average success rate from matched runbooks
-        avg_success_rate = sum(rb.get("success_rate", 0.7) for rb in runbooks) / len(runbooks)
-        
         # Adjust based on classification confidence
         probability = avg_success_rate * (0.7 + 0.3 * confidence)
         
@@ -439,131 +695,60 @@ class ResolutionAdvisorTool(Tool):
         
         return min(probability, 0.95)  # Cap at 95%
     
-    def _requires_human_approval(self, steps: List[ResolutionStep], severity: str) -> bool:
+    def _requires_human_approval(self, stats: StepStats, severity: str) -> bool:
         """Determine if human approval is required"""
-        # Always require approval for critical incidents
-        if severity == "critical":
-            return True
-        
-        # Require approval for high-risk steps
-        high_risk_steps = [step for step in steps if step.risk_level == "high"]
-        if high_risk_steps:
-            return True
-        
-        # Require approval for database operations
-        db_operations = [step for step in steps if "database" in step.command.lower() or "pg_" in step.command]
-        if db_operations:
-            return True
-        
-        return False
+        # Always require approval for critical incidents, high-risk steps and database operations
+        return severity == "critical" or stats.has_high_risk or stats.has_db_op
     
-    def _identify_parallel_actions(self, steps: List[ResolutionStep]) -> List[str]:
+    def _identify_parallel_actions(self, stats: StepStats) -> List[str]:
         """Identify actions that can be performed in parallel"""
         parallel_actions = []
         
         # Monitoring and investigation can often be done in parallel
-        monitoring_steps = [step for step in steps if "monitor" in step.description.lower()]
-        if len(monitoring_steps) > 1:
+        if stats.monitor_count > 1:
             parallel_actions.append("Multiple monitoring tasks can be executed simultaneously")
         
         # Log analysis and health checks can be parallel
-        investigation_steps = [step for step in steps if any(keyword in step.description.lower() 
-                                                           for keyword in ["check", "analyze", "review"])]
-        if len(investigation_steps) > 1:
+        if stats.investigation_count > 1:
             parallel_actions.append("Investigation and analysis steps can run concurrently")
         
         return parallel_actions
     
-    def _generate_rollback_plan(self, steps: List[ResolutionStep]) -> List[str]:
+    def _generate_rollback_plan(self, columns: StepColumns) -> Tuple[str, ...]:
         """Generate complete rollback procedure"""
-        rollback_plan = []
-        
-        # Collect rollback commands in reverse order
-        for step in reversed(steps):
-            if step.rollback_command:
-                rollback_plan.append(f"Step {step.step_number} rollback: {step.rollback_command}")
-        
-        # Add general rollback guidance
-        if not rollback_plan:
-            rollback_plan = [
-                "No specific rollback commands available",
-                "Monitor system state and manually revert changes if needed",
-                "Restore from backup if system state is compromised"
-            ]
-        else:
-            rollback_plan.insert(0, "Execute rollback commands in the following order:")
-        
-        return rollback_plan
+        return _build_rollback_plan(columns)
     
-    def _gather_prerequisites(self, runbooks: List[Dict], category: str) -> List[str]:
+    def _gather_prerequisites(self, runbooks: List[Dict], category: str) -> Tuple[str, ...]:
         """Gather all prerequisites from matched runbooks"""
-        prerequisites = set()
-        
+        # Category-specific prerequisites, then a bitwise union over the runbooks
+        mask = _CATEGORY_PREREQUISITE_MASKS.get(category, 0)
         for runbook in runbooks:
-            prerequisites.update(runbook.get("prerequisites", []))
+            mask |= runbook["prerequisite_mask"]
         
-        # Add category-specific prerequisites
-        if category == "database":
-            prerequisites.add("database admin access")
-        if category == "infrastructure":
-            prerequisites.add("system admin access")
-        if category == "application":
-            prerequisites.add("kubectl access")
-        
-        return list(prerequisites)
+        return _prerequisites_for_mask(mask)
     
     def _generate_reasoning(self, category: str, severity: str, runbook_count: int, success_prob: float) -> str:
         """Generate reasoning for the recommended approach"""
-        reasoning_parts = []
-        
-        reasoning_parts.append(f"Resolution approach selected for {category} incident with {severity} severity.")
-        
-        if runbook_count > 0:
-            reasoning_parts.append(f"Matched {runbook_count} proven runbook(s) for this incident type.")
-        else:
-            reasoning_parts.append("No specific runbooks matched - using generic resolution approach.")
-        
+        # Only the probability band shows in the text, so it (not the float) is the cache key
         if success_prob > 0.8:
-            reasoning_parts.append("High probability of successful resolution based on historical data.")
+            band = "high"
         elif success_prob < 0.6:
-            reasoning_parts.append("Moderate success probability - consider escalation if initial steps fail.")
-        
-        if severity == "critical":
-            reasoning_parts.append("Critical severity requires immediate action and human oversight.")
+            band = "low"
+        else:
+            band = None
         
-        return " ".join(reasoning_parts)
+        return _reasoning_text(category, severity, runbook_count, band)
     
     def _generate_fallback_resolution(self, error: str) -> Dict[str, Any]:
         """Generate fallback resolution when main logic fails"""
-        return {
-            "incident_id": "unknown",
-            "recommended_steps": [
-                {
-                    "step_number": 1,
-                    "description": "Manual investigation required",
-                    "command": "Review all available data sources",
-                    "expected_result": "Understanding of incident scope",
-                    "automation_possible": False,
-                    "risk_level": "low"
-                },
-                {
-                    "step_number": 2,
-                    "description": "Escalate to senior engineer",
-                    "command": "Contact on-call senior engineer",
-                    "expected_result": "Expert assistance engaged",
-                    "automation_possible": False,
-                    "risk_level": "low"
-                }
-            ],
-            "estimated_time_minutes": 60,
-            "success_probability": 0.8,
-            "human_approval_required": True,
-            "parallel_actions": [],
-            "rollback_plan": "No automated rollback available - manual intervention required",
-            "prerequisites": ["Access to monitoring systems", "Contact information for senior engineer"],
-            "reasoning": f"Fallback resolution due to error: {error}. Manual investigation and escalation required.",
-            "generated_at": datetime.now().isoformat()
-        }
+        resolution = dict(_FALLBACK_TEMPLATE)
+        # Hand out mutable copies; the template itself stays read-only
+        resolution["recommended_steps"] = [dict(step) for step in _FALLBACK_TEMPLATE["recommended_steps"]]
+        resolution["parallel_actions"] = []
+        resolution["prerequisites"] = list(_FALLBACK_TEMPLATE["prerequisites"])
+        resolution["reasoning"] = f"Fallback resolution due to error: {error}. Manual investigation and escalation required."
+        resolution["generated_at"] = _now_iso()
+        return resolution
 
 
 # Create the tool instance
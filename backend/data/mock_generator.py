@@ -1,152 +1,215 @@
 """
 Mock data generators for DevOps Crisis Commander
 """
+import functools
+import itertools
 import random
-import sys
-import os
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import List
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Tuple
 
-# Add parent directory to path for imports
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from models.models import Alert, AlertType, SeverityLevel, AlertMetrics, Runbook, RunbookStep
 
+# Sequential ids for scenario alerts; unlike random ids these never collide
+_ALERT_IDS = itertools.count(1000)
+
+# Alerts are backdated by 0-300 seconds; the offsets are built once and sampled
+_ALERT_AGES = tuple(timedelta(seconds=age) for age in range(301))
+
+_REGIONS = ("us-east-1", "eu-west-1", "ap-southeast-1")
+
+# (metric, max absolute jitter) applied to non-zero scenario metrics
+_METRIC_JITTER = (("cpu_usage", 5), ("memory_usage", 3), ("response_time", 500))
+
+
+@dataclass(frozen=True, slots=True)
+class ScenarioTemplate:
+    """Static definition of a mock incident scenario"""
+    alert_type: AlertType
+    severity: SeverityLevel
+    message: str
+    metrics: Dict[str, float]
+    affected_services: List[str]
+    source_system: str
+    details: Mapping[str, Any] = field(init=False, repr=False, compare=False)
+    jitter: Tuple[Tuple[str, float], ...] = field(init=False, repr=False, compare=False)
+    metrics_template: AlertMetrics = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Validated once; alerts start from a copy of it
+        object.__setattr__(self, "metrics_template", AlertMetrics(**self.metrics))
+        # Only the non-zero metrics get randomized, so resolve them once here
+        object.__setattr__(self, "jitter", tuple(
+            (metric, spread) for metric, spread in _METRIC_JITTER if self.metrics.get(metric)
+        ))
+        # Shared, read-only view used as the base of scenario alert payloads
+        object.__setattr__(self, "details", MappingProxyType({
+            "alert_type": self.alert_type,
+            "severity": self.severity,
+            "message": self.message,
+            "metrics": self.metrics,
+            "affected_services": self.affected_services,
+            "source_system": self.source_system
+        }))
+
 
 class MockDataGenerator:
     """Generates realistic mock alerts and scenarios for demo purposes"""
     
     MOCK_SCENARIOS = {
-        "cpu_spike_critical": {
-            "alert_type": AlertType.CPU,
-            "severity": SeverityLevel.CRITICAL,
-            "message": "CPU usage exceeded 95% threshold on production server",
-            "metrics": {"cpu_usage": 98.5, "memory_usage": 82.3},
-            "affected_services": ["api-gateway", "user-service"],
-            "source_system": "prometheus-monitoring"
-        },
+        "cpu_spike_critical": ScenarioTemplate(
+            alert_type=AlertType.CPU,
+            severity=SeverityLevel.CRITICAL,
+            message="CPU usage exceeded 95% threshold on production server",
+            metrics={"cpu_usage": 98.5, "memory_usage": 82.3},
+            affected_services=["api-gateway", "user-service"],
+            source_system="prometheus-monitoring"
+        ),
         
-        "database_connection_exhausted": {
-            "alert_type": AlertType.DATABASE,
-            "severity": SeverityLevel.HIGH,
-            "message": "Database connection pool exhausted - max connections reached",
-            "metrics": {"response_time": 5000, "error_rate": 0.25},
-            "affected_services": ["user-db", "order-service"],
-            "source_system": "database-monitor"
-        },
+        "database_connection_exhausted": ScenarioTemplate(
+            alert_type=AlertType.DATABASE,
+            severity=SeverityLevel.HIGH,
+            message="Database connection pool exhausted - max connections reached",
+            metrics={"response_time": 5000, "error_rate": 0.25},
+            affected_services=["user-db", "order-service"],
+            source_system="database-monitor"
+        ),
         
-        "memory_leak_detected": {
-            "alert_type": AlertType.MEMORY,
-            "severity": SeverityLevel.HIGH,
-            "message": "Memory usage steadily increasing over 4 hours",
-            "metrics": {"memory_usage": 89.7, "cpu_usage": 45.2},
-            "affected_services": ["payment-service"],
-            "source_system": "application-insights"
-        },
+        "memory_leak_detected": ScenarioTemplate(
+            alert_type=AlertType.MEMORY,
+            severity=SeverityLevel.HIGH,
+            message="Memory usage steadily increasing over 4 hours",
+            metrics={"memory_usage": 89.7, "cpu_usage": 45.2},
+            affected_services=["payment-service"],
+            source_system="application-insights"
+        ),
         
-        "disk_space_warning": {
-            "alert_type": AlertType.DISK,
-            "severity": SeverityLevel.MEDIUM,
-            "message": "Disk usage approaching 85% on log partition",
-            "metrics": {"disk_usage": 84.3},
-            "affected_services": ["logging-service"],
-            "source_system": "infrastructure-monitor"
-        },
+        "disk_space_warning": ScenarioTemplate(
+            alert_type=AlertType.DISK,
+            severity=SeverityLevel.MEDIUM,
+            message="Disk usage approaching 85% on log partition",
+            metrics={"disk_usage": 84.3},
+            affected_services=["logging-service"],
+            source_system="infrastructure-monitor"
+        ),
         
-        "network_latency_spike": {
-            "alert_type": AlertType.NETWORK,
-            "severity": SeverityLevel.MEDIUM,
-            "message": "Network latency increased 300% between regions",
-            "metrics": {"response_time": 1200, "error_rate": 0.08},
-            "affected_services": ["cdn", "api-gateway"],
-            "source_system": "network-monitor"
-        },
+        "network_latency_spike": ScenarioTemplate(
+            alert_type=AlertType.NETWORK,
+            severity=SeverityLevel.MEDIUM,
+            message="Network latency increased 300% between regions",
+            metrics={"response_time": 1200, "error_rate": 0.08},
+            affected_services=["cdn", "api-gateway"],
+            source_system="network-monitor"
+        ),
         
-        "application_error_rate": {
-            "alert_type": AlertType.APPLICATION,
-            "severity": SeverityLevel.HIGH,
-            "message": "Application error rate exceeding 10% threshold",
-            "metrics": {"error_rate": 0.15, "response_time": 3500},
-            "affected_services": ["checkout-service", "inventory-service"],
-            "source_system": "application-monitor"
-        },
+        "application_error_rate": ScenarioTemplate(
+            alert_type=AlertType.APPLICATION,
+            severity=SeverityLevel.HIGH,
+            message="Application error rate exceeding 10% threshold",
+            metrics={"error_rate": 0.15, "response_time": 3500},
+            affected_services=["checkout-service", "inventory-service"],
+            source_system="application-monitor"
+        ),
         
-        "service_health_check_failing": {
-            "alert_type": AlertType.APPLICATION,
-            "severity": SeverityLevel.CRITICAL,
-            "message": "Health check endpoint returning 503 for critical service",
-            "metrics": {"error_rate": 1.0, "response_time": 0},
-            "affected_services": ["auth-service"],
-            "source_system": "kubernetes-monitor"
-        },
+        "service_health_check_failing": ScenarioTemplate(
+            alert_type=AlertType.APPLICATION,
+            severity=SeverityLevel.CRITICAL,
+            message="Health check endpoint returning 503 for critical service",
+            metrics={"error_rate": 1.0, "response_time": 0},
+            affected_services=["auth-service"],
+            source_system="kubernetes-monitor"
+        ),
         
-        "ssl_certificate_expiring": {
-            "alert_type": AlertType.NETWORK,
-            "severity": SeverityLevel.LOW,
-            "message": "SSL certificate expires in 7 days",
-            "metrics": {},
-            "affected_services": ["api.company.com"],
-            "source_system": "certificate-monitor"
-        },
+        "ssl_certificate_expiring": ScenarioTemplate(
+            alert_type=AlertType.NETWORK,
+            severity=SeverityLevel.LOW,
+            message="SSL certificate expires in 7 days",
+            metrics={},
+            affected_services=["api.company.com"],
+            source_system="certificate-monitor"
+        ),
         
-        "backup_failure": {
-            "alert_type": AlertType.DATABASE,
-            "severity": SeverityLevel.MEDIUM,
-            "message": "Automated backup failed for production database",
-            "metrics": {},
-            "affected_services": ["backup-service", "main-db"],
-            "source_system": "backup-monitor"
-        },
+        "backup_failure": ScenarioTemplate(
+            alert_type=AlertType.DATABASE,
+            severity=SeverityLevel.MEDIUM,
+            message="Automated backup failed for production database",
+            metrics={},
+            affected_services=["backup-service", "main-db"],
+            source_system="backup-monitor"
+        ),
         
-        "redis_cluster_node_down": {
-            "alert_type": AlertType.DATABASE,
-            "severity": SeverityLevel.HIGH,
-            "message": "Redis cluster node unresponsive - failover initiated",
-            "metrics": {"response_time": 2000, "error_rate": 0.12},
-            "affected_services": ["cache-layer", "session-service"],
-            "source_system": "redis-monitor"
-        }
+        "redis_cluster_node_down": ScenarioTemplate(
+            alert_type=AlertType.DATABASE,
+            severity=SeverityLevel.HIGH,
+            message="Redis cluster node unresponsive - failover initiated",
+            metrics={"response_time": 2000, "error_rate": 0.12},
+            affected_services=["cache-layer", "session-service"],
+            source_system="redis-monitor"
+        )
     }
     
     @classmethod
     def generate_alert(cls, scenario_name: str = None) -> Alert:
         """Generate a mock alert based on scenario or random"""
-        if scenario_name and scenario_name in cls.MOCK_SCENARIOS:
-            scenario = cls.MOCK_SCENARIOS[scenario_name]
+        scenario = cls.MOCK_SCENARIOS.get(scenario_name) if scenario_name else None
+        if scenario is None:
+            scenario = random.choice(cls._scenario_values())
+        
+        return cls._alert_from_scenario(scenario, datetime.now() - random.choice(_ALERT_AGES))
+    
+    @classmethod
+    def generate_alerts(cls, count: int, scenario_name: str = None) -> List[Alert]:
+        """Generate several mock alerts, drawing random scenarios and ages in one call each"""
+        scenario = cls.MOCK_SCENARIOS.get(scenario_name) if scenario_name else None
+        if scenario is not None:
+            scenarios = [scenario] * count
         else:
-            scenario = random.choice(list(cls.MOCK_SCENARIOS.values()))
+            scenarios = random.choices(cls._scenario_values(), k=count)
         
+        now = datetime.now()
+        ages = random.choices(_ALERT_AGES, k=count)
+        return [cls._alert_from_scenario(scenario, now - age) for scenario, age in zip(scenarios, ages)]
+    
+    @classmethod
+    @functools.cache
+    def _scenario_values(cls) -> tuple:
+        """Scenario definitions as a tuple for random selection"""
+        return tuple(cls.MOCK_SCENARIOS.values())
+    
+    @classmethod
+    def _alert_from_scenario(cls, scenario: ScenarioTemplate, timestamp: datetime) -> Alert:
+        """Build an alert from a scenario definition with randomized metrics"""
         # Add some randomness to metrics
-        metrics = AlertMetrics(**scenario["metrics"])
-        if metrics.cpu_usage:
-            metrics.cpu_usage += random.uniform(-5, 5)
-        if metrics.memory_usage:
-            metrics.memory_usage += random.uniform(-3, 3)
-        if metrics.response_time:
-            metrics.response_time += random.uniform(-500, 500)
+        metrics = scenario.metrics_template.model_copy()
+        for metric, spread in scenario.jitter:
+            setattr(metrics, metric, getattr(metrics, metric) + random.uniform(-spread, spread))
         
         return Alert(
-            timestamp=datetime.now() - timedelta(seconds=random.randint(0, 300)),
-            source_system=scenario["source_system"],
-            alert_type=scenario["alert_type"],
-            severity=scenario["severity"],
-            message=scenario["message"],
+            timestamp=timestamp,
+            source_system=scenario.source_system,
+            alert_type=scenario.alert_type,
+            severity=scenario.severity,
+            message=scenario.message,
             metrics=metrics,
-            affected_services=scenario["affected_services"],
+            affected_services=scenario.affected_services,
             metadata={
                 "environment": "production",
-                "region": random.choice(["us-east-1", "eu-west-1", "ap-southeast-1"]),
+                "region": random.choice(_REGIONS),
                 "cluster": f"cluster-{random.randint(1, 5)}"
             }
         )
     
     @classmethod
+    @functools.cache
     def get_scenario_names(cls) -> List[str]:
-        """Get list of available scenario names"""
+        """Get list of available scenario names (cached; treat as read-only)"""
         return list(cls.MOCK_SCENARIOS.keys())
     
     @classmethod
+    @functools.cache
     def generate_runbooks(cls) -> List[Runbook]:
-        """Generate mock runbooks for different incident types"""
+        """Generate mock runbooks for different incident types (cached; treat as read-only)"""
         runbooks = [
             Runbook(
                 category="cpu",
@@ -298,23 +361,39 @@ class MockDataGenerator:
         
         return runbooks
     
+    @classmethod
+    @functools.cache
+    def get_runbooks_serialized(cls) -> tuple:
+        """Get the mock runbooks as plain dicts (cached; treat as read-only)"""
+        return tuple(runbook.model_dump() for runbook in cls.generate_runbooks())
+    
+    @classmethod
+    @functools.cache
+    def get_scenario_details(cls) -> dict:
+        """Get display details for every scenario (cached; treat as read-only)"""
+        return {
+            scenario_name: {
+                "name": scenario_name.replace('_', ' ').title(),
+                "description": scenario.message,
+                "severity": scenario.severity,
+                "type": scenario.alert_type,
+                "affected_services": scenario.affected_services
+            }
+            for scenario_name, scenario in cls.MOCK_SCENARIOS.items()
+        }
+    
     @classmethod
     def generate_scenario_alert(cls, scenario_name: str) -> dict:
         """Generate alert data for a specific scenario"""
-        if scenario_name not in cls.MOCK_SCENARIOS:
+        scenario = cls.MOCK_SCENARIOS.get(scenario_name)
+        if scenario is None:
             # Return random alert if scenario not found
             return cls.generate_random_alert()
         
-        scenario = cls.MOCK_SCENARIOS[scenario_name]
         
         return {
-            "id": f"alert-{random.randint(1000, 9999)}",
-            "alert_type": scenario["alert_type"],
-            "severity": scenario["severity"],
-            "message": scenario["message"],
-            "metrics": scenario["metrics"],
-            "affected_services": scenario["affected_services"],
-            "source_system": scenario["source_system"],
+            "id": f"alert-{next(_ALERT_IDS)}",
+            **scenario.details,
             "timestamp": datetime.now().isoformat(),
             "scenario_name": scenario_name
         }
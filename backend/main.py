@@ -1,18 +1,100 @@
 """
 FastAPI Backend for DevOps Crisis Commander
 """
+import asyncio
+import functools
 import json
+import logging
+import os
+import sys
+import time
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Iterable, Set, Tuple
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from pydantic_core import PydanticSerializationError
 
 from models.models import Alert, Incident, WebSocketMessage
-from agents.orchestrator import crisis_commander
+from agents.orchestrator import get_commander
 from data.mock_generator import MockDataGenerator
 
+logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s", stream=sys.stdout)
+logger = logging.getLogger(__name__)
+
+# Suppress the startup banner, e.g. for benchmark runs
+QUIET = os.getenv("QUIET", "").lower() in ("1", "true", "yes")
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch the latter
+try:
+    import orjson
+    from orjson import loads as _loads
+    
+    def _dumps(message: Any) -> str:
+        return orjson.dumps(message, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+except ImportError:
+    from json import loads as _loads
+    
+    def _dumps(message: Any) -> str:
+        return json.dumps(message, default=str)
+
+# Keepalive exchanged with clients on /ws without any JSON parsing
+WS_PING = "ping"
+WS_PONG = '{"type":"pong"}'
+
+
+def _message_json(message: BaseModel) -> str:
+    """Serialize a model without an intermediate dict, falling back for arbitrary payload values"""
+    try:
+        return message.model_dump_json()
+    except PydanticSerializationError:
+        return _dumps(message.model_dump())
+
+
+# Broadcast types carrying large payloads (post-mortems); serialized off the event loop
+LARGE_MESSAGE_TYPES = frozenset({"incident_completed"})
+
+# Timeline actions whose result carries a resolution plan
+RESOLUTION_ACTIONS = frozenset({"suggest_resolution", "Resolution plan generated"})
+
+# Incident fields served by /incidents/{id}/timeline
+TIMELINE_FIELDS = {"timeline", "status"}
+
+# Incidents streamed between event-loop yields in list responses
+STREAM_YIELD_EVERY = 100
+
+# Severities reported by /metrics/dashboard
+DASHBOARD_SEVERITIES = ("critical", "high", "medium", "low")
+
+# Scenarios accepted by one /incidents/simulate/batch request
+MAX_BATCH_SIMULATIONS = 20
+
+# Static agent readiness shown on the dashboard
+AGENT_STATUS = {
+    "incident_classifier": "ready",
+    "resolution_advisor": "ready",
+    "postmortem_generator": "ready"
+}
+
+# Response timestamps are shared across requests within this window
+TIMESTAMP_REUSE_SECONDS = 0.05
+
+_last_timestamp: Tuple[float, str] = (float("-inf"), "")
+
+
+def _now_iso() -> str:
+    """Current local time in ISO format, reused for up to TIMESTAMP_REUSE_SECONDS"""
+    global _last_timestamp
+    now = time.monotonic()
+    stamped_at, iso = _last_timestamp
+    if now - stamped_at < TIMESTAMP_REUSE_SECONDS:
+        return iso
+    iso = datetime.now().isoformat()
+    _last_timestamp = (now, iso)
+    return iso
+
 
 app = FastAPI(
     title="DevOps Crisis Commander API",
@@ -38,37 +120,51 @@ app.add_middleware(
 # WebSocket connection manager
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        self._registered = False
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
         
-        # Register with crisis commander for updates
-        crisis_commander.register_websocket_callback(self.broadcast_to_websocket)
+        # Register with crisis commander for updates (once per manager)
+        if not self._registered:
+            get_commander().register_websocket_callback(self.broadcast_to_websocket)
+            self._registered = True
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        await websocket.send_text(json.dumps(message, default=str))
+        await websocket.send_text(_dumps(message))
 
     async def broadcast(self, message: dict):
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message, default=str))
-            except Exception:
-                disconnected.append(connection)
-        
-        # Remove disconnected connections
-        for conn in disconnected:
-            self.disconnect(conn)
+        # Serialize once for the whole fan-out
+        if message.get("type") in LARGE_MESSAGE_TYPES:
+            payload = await asyncio.to_thread(_dumps, message)
+        else:
+            payload = _dumps(message)
+        await self._send_to_all(payload)
+    
+    async def _send_to_all(self, payload: str):
+        # Send to a snapshot concurrently, then drop the connections that failed
+        connections = tuple(self.active_connections)
+        results = await asyncio.gather(
+            *(connection.send_text(payload) for connection in connections),
+            return_exceptions=True
+        )
+        for connection, result in zip(connections, results):
+            if isinstance(result, Exception):
+                self.disconnect(connection)
     
     async def broadcast_to_websocket(self, message: WebSocketMessage):
         """Callback for crisis commander updates"""
-        await self.broadcast(message.dict())
+        # Fixed-shape message: pydantic-core writes the JSON straight from the model
+        if message.type in LARGE_MESSAGE_TYPES:
+            payload = await asyncio.to_thread(_message_json, message)
+        else:
+            payload = _message_json(message)
+        await self._send_to_all(payload)
 
 manager = ConnectionManager()
 
@@ -78,6 +174,10 @@ class SimulationRequest(BaseModel):
     scenario_name: str = None
 
 
+class BatchSimulationRequest(BaseModel):
+    scenarios: List[str] = Field(..., max_length=MAX_BATCH_SIMULATIONS)
+
+
 class AlertRequest(BaseModel):
     alert: Alert
 
@@ -90,13 +190,16 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             # Keep connection alive and handle any client messages
             data = await websocket.receive_text()
-            message = json.loads(data)
+            if data == WS_PING:
+                await websocket.send_text(WS_PONG)
+                continue
+            message = _loads(data)
             
             # Echo back for testing
             await manager.send_personal_message({
                 "type": "echo",
                 "data": message,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": _now_iso()
             }, websocket)
             
     except WebSocketDisconnect:
@@ -104,9 +207,12 @@ async def websocket_endpoint(websocket: WebSocket):
 
 
 # API Routes
-def _to_dict(obj: Any) -> Dict[str, Any]:
-    if hasattr(obj, 'dict'):
-        return obj.dict()
+def _to_dict(obj: Any, include: Set[str] | None = None) -> Dict[str, Any]:
+    if type(obj) is dict:
+        return obj
+    # Dumps nested models (classification, timeline) in one pydantic-core pass
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(mode="json", include=include)
     return obj
 
 def _extract_resolution_from_timeline(incident: Dict[str, Any]) -> Dict[str, Any] | None:
@@ -114,7 +220,7 @@ def _extract_resolution_from_timeline(incident: Dict[str, Any]) -> Dict[str, Any
     # Portia orchestrator stores step with action 'suggest_resolution'
     for entry in timeline:
         action = entry.get("action") or entry.get("event")
-        if action in ("suggest_resolution", "Resolution plan generated"):
+        if action in RESOLUTION_ACTIONS:
             result = entry.get("result") or entry.get("details")
             if isinstance(result, dict) and result.get("recommended_steps"):
                 return result
@@ -122,15 +228,14 @@ def _extract_resolution_from_timeline(incident: Dict[str, Any]) -> Dict[str, Any
     return None
 
 def normalize_incident(incident_obj: Any) -> Dict[str, Any]:
+    """Full normalization; endpoints needing only a few fields should dump just those"""
     inc = _to_dict(incident_obj)
-    # Ensure classification is plain dict if it's a Pydantic model
-    if hasattr(inc.get("classification", {}), 'dict'):
-        inc["classification"] = inc["classification"].dict()
-    # Attach resolution if missing and can be extracted from timeline
-    if not inc.get("resolution"):
-        res = _extract_resolution_from_timeline(inc)
-        if res:
-            inc["resolution"] = res
+    # Nothing to attach if a resolution exists or there is no timeline to take one from
+    if inc.get("resolution") or not inc.get("timeline"):
+        return inc
+    res = _extract_resolution_from_timeline(inc)
+    if res:
+        inc["resolution"] = res
     return inc
 @app.get("/")
 async def root():
@@ -144,11 +249,12 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    commander = get_commander()
     return {
         "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "active_incidents": len(crisis_commander.get_active_incidents()),
-        "completed_incidents": len(crisis_commander.get_completed_incidents())
+        "timestamp": _now_iso(),
+        "active_incidents": len(commander.get_active_incidents()),
+        "completed_incidents": len(commander.get_completed_incidents())
     }
 
 
@@ -156,40 +262,71 @@ async def health_check():
 async def simulate_incident(request: SimulationRequest):
     """Simulate an incident for demo purposes"""
     try:
-        incident = await crisis_commander.simulate_incident(request.scenario_name)
+        incident = await get_commander().simulate_incident(request.scenario_name)
         return normalize_incident(incident)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/incidents/simulate/batch")
+async def simulate_incidents(request: BatchSimulationRequest):
+    """
+    Simulate several incidents concurrently in one request
+    Each scenario gets its own result, carrying either the incident or the error
+    it failed with, so one failure does not hide incidents already created
+    """
+    try:
+        outcomes = await get_commander().simulate_incidents(request.scenarios)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return [
+        {"scenario_name": name, "error": str(outcome) or type(outcome).__name__}
+        if isinstance(outcome, BaseException)
+        else {"scenario_name": name, "incident": normalize_incident(outcome)}
+        for name, outcome in zip(request.scenarios, outcomes)
+    ]
+
+
 @app.post("/incidents/process")
 async def process_alert(request: AlertRequest):
     """Process a real alert through the incident response workflow"""
     try:
-        incident = await crisis_commander.process_alert(request.alert)
+        incident = await get_commander().process_alert(request.alert)
         return normalize_incident(incident)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _stream_incidents(incidents: Iterable[Any]) -> AsyncIterator[str]:
+    """Emit a JSON array of normalized incidents, one element at a time"""
+    yield "["
+    for index, incident in enumerate(incidents):
+        if index:
+            yield ","
+            if index % STREAM_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        yield _dumps(normalize_incident(incident))
+    yield "]"
+
+
 @app.get("/incidents/active")
 async def get_active_incidents():
     """Get all active incidents"""
-    incidents = crisis_commander.get_active_incidents()
-    return [normalize_incident(i) for i in incidents]
+    incidents = get_commander().get_active_incidents()
+    return StreamingResponse(_stream_incidents(incidents), media_type="application/json")
 
 
 @app.get("/incidents/completed")
 async def get_completed_incidents():
     """Get all completed incidents"""
-    incidents = crisis_commander.get_completed_incidents()
-    return [normalize_incident(i) for i in incidents]
+    incidents = get_commander().get_completed_incidents()
+    return StreamingResponse(_stream_incidents(incidents), media_type="application/json")
 
 
 @app.get("/incidents/{incident_id}")
 async def get_incident(incident_id: str):
     """Get specific incident by ID"""
-    incident = crisis_commander.get_incident_by_id(incident_id)
+    incident = get_commander().get_incident_by_id(incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
     return normalize_incident(incident)
@@ -198,10 +335,11 @@ async def get_incident(incident_id: str):
 @app.get("/incidents/{incident_id}/timeline")
 async def get_incident_timeline(incident_id: str):
     """Get incident timeline"""
-    incident = crisis_commander.get_incident_by_id(incident_id)
+    incident = get_commander().get_incident_by_id(incident_id)
     if not incident:
         raise HTTPException(status_code=404, detail="Incident not found")
-    incident = normalize_incident(incident)
+    # Only the timeline and status are returned, so skip the full dump and resolution scan
+    incident = _to_dict(incident, include=TIMELINE_FIELDS)
     return {
         "incident_id": incident_id,
         "timeline": incident.get("timeline", []),
@@ -213,103 +351,100 @@ async def get_incident_timeline(incident_id: str):
 async def resolve_incident(incident_id: str):
     """Resolve an incident and return updated record (with postmortem if available)."""
     try:
-        if hasattr(crisis_commander, 'resolve_incident'):
-            incident = await crisis_commander.resolve_incident(incident_id)
+        commander = get_commander()
+        if hasattr(commander, 'resolve_incident'):
+            incident = await commander.resolve_incident(incident_id)
         else:
             # Fallback to simple orchestrator resolve if present
-            incident = await crisis_commander.resolve_incident(incident_id)  # type: ignore
+            incident = await commander.resolve_incident(incident_id)  # type: ignore
         return normalize_incident(incident)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/scenarios")
-async def get_available_scenarios():
-    """Get available simulation scenarios"""
-    scenarios = crisis_commander.get_available_scenarios()
+@functools.lru_cache(maxsize=1)
+def _scenario_details_for(scenarios: Tuple[str, ...]) -> Dict[str, Any]:
+    """Build the /scenarios body for a set of names (cached; treat as read-only)"""
+    # Details are precomputed by the mock generator; only unknown names need building
+    known_details = MockDataGenerator.get_scenario_details()
     scenario_details = {}
     
     for scenario_name in scenarios:
-        # Get scenario details from mock generator
-        scenario_data = MockDataGenerator.MOCK_SCENARIOS.get(scenario_name, {})
-        scenario_details[scenario_name] = {
+        scenario_details[scenario_name] = known_details.get(scenario_name) or {
             "name": scenario_name.replace('_', ' ').title(),
-            "description": scenario_data.get("message", ""),
-            "severity": scenario_data.get("severity", "medium"),
-            "type": scenario_data.get("alert_type", "unknown"),
-            "affected_services": scenario_data.get("affected_services", [])
+            "description": "",
+            "severity": "medium",
+            "type": "unknown",
+            "affected_services": []
         }
     
     return scenario_details
 
 
+@app.get("/scenarios")
+async def get_available_scenarios():
+    """Get available simulation scenarios"""
+    return _scenario_details_for(tuple(get_commander().get_available_scenarios()))
+
+
 @app.get("/scenarios/{scenario_name}")
 async def get_scenario_details(scenario_name: str):
     """Get details for a specific scenario"""
-    if scenario_name not in MockDataGenerator.MOCK_SCENARIOS:
+    scenario_data = MockDataGenerator.MOCK_SCENARIOS.get(scenario_name)
+    if scenario_data is None:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    scenario_data = MockDataGenerator.MOCK_SCENARIOS[scenario_name]
     return {
         "name": scenario_name,
-        "details": scenario_data
+        "details": dict(scenario_data.details)
     }
 
 
 @app.get("/runbooks")
 async def get_runbooks():
     """Get available runbooks"""
-    runbooks = MockDataGenerator.generate_runbooks()
-    return [runbook.dict() for runbook in runbooks]
+    return MockDataGenerator.get_runbooks_serialized()
 
 
 @app.get("/metrics/dashboard")
 async def get_dashboard_metrics():
     """Get metrics for dashboard display"""
-    active_incidents = crisis_commander.get_active_incidents()
-    completed_incidents = crisis_commander.get_completed_incidents()
+    commander = get_commander()
+    active_count = len(commander.active_incidents)
+    completed_count = len(commander.completed_incidents)
     
     # Calculate basic metrics
-    total_incidents = len(active_incidents) + len(completed_incidents)
+    total_incidents = active_count + completed_count
     
-    # Severity breakdown
-    severity_counts = {"critical": 0, "high": 0, "medium": 0, "low": 0}
-    
-    for incident in active_incidents + completed_incidents:
-        classification = incident.get("classification", {})
-        if classification:
-            severity = classification.get("severity", "medium")
-            if severity in severity_counts:
-                severity_counts[severity] += 1
+    # Severity breakdown, maintained by the commander as incidents are classified
+    severity_counts = {severity: commander.severity_counts[severity] for severity in DASHBOARD_SEVERITIES}
     
     # Resolution time (mock data for demo)
     avg_resolution_time = 15.5  # minutes
     
     return {
         "total_incidents": total_incidents,
-        "active_incidents": len(active_incidents),
-        "completed_incidents": len(completed_incidents),
+        "active_incidents": active_count,
+        "completed_incidents": completed_count,
         "severity_breakdown": severity_counts,
         "avg_resolution_time_minutes": avg_resolution_time,
         "automation_rate": 0.78,  # 78% automated
-        "agent_status": {
-            "incident_classifier": "ready",
-            "resolution_advisor": "ready", 
-            "postmortem_generator": "ready"
-        }
+        "agent_status": AGENT_STATUS
     }
 
 
 @app.post("/admin/reset")
 async def reset_system():
     """Reset the system (clear all incidents) - for demo purposes"""
-    crisis_commander.active_incidents.clear()
-    crisis_commander.completed_incidents.clear()
+    commander = get_commander()
+    commander.active_incidents.clear()
+    commander.completed_incidents.clear()
+    commander.severity_counts.clear()
     
     await manager.broadcast({
         "type": "system_reset",
         "data": {"message": "System reset completed"},
-        "timestamp": datetime.now().isoformat()
+        "timestamp": _now_iso()
     })
     
     return {"success": True, "message": "System reset completed"}
@@ -332,12 +467,16 @@ async def demo_status():
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    # Use ASCII-only messages to avoid Windows console encoding issues
-    print("DevOps Crisis Commander API starting up...")
-    print("WebSocket endpoint available at: /ws")
-    print("Dashboard metrics available at: /metrics/dashboard")
-    print("Demo scenarios available at: /scenarios")
-    print("System ready for incident simulation!")
+    if QUIET:
+        return
+    # Use ASCII-only messages to avoid Windows console encoding issues; one write for the whole banner
+    logger.info("\n".join((
+        "DevOps Crisis Commander API starting up...",
+        "WebSocket endpoint available at: /ws",
+        "Dashboard metrics available at: /metrics/dashboard",
+        "Demo scenarios available at: /scenarios",
+        "System ready for incident simulation!",
+    )))
 
 
 if __name__ == "__main__":
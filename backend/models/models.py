@@ -1,11 +1,37 @@
 """
 Data models for DevOps Crisis Commander
 """
+import os
+from collections import deque
 from datetime import datetime
 from enum import Enum
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
-from uuid import uuid4
+from typing import Deque, Dict, List, Optional, Any
+from pydantic import BaseModel, Field, PrivateAttr
+
+# Ids formatted per os.urandom read
+ID_POOL_SIZE = 256
+
+_id_pool: Deque[str] = deque()
+
+# A forked child must not hand out the ids its parent already drew
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_id_pool.clear)
+
+
+def new_id() -> str:
+    """Random version-4 UUID string, drawn from a pool refilled in batches"""
+    try:
+        return _id_pool.popleft()
+    except IndexError:
+        pass
+    hex_digits = os.urandom(16 * ID_POOL_SIZE).hex()
+    # Version nibble forced to 4 and variant bits to 10xx, as uuid4() does
+    _id_pool.extend(
+        f"{hex_digits[i:i + 8]}-{hex_digits[i + 8:i + 12]}-4{hex_digits[i + 13:i + 16]}-"
+        f"{'89ab'[int(hex_digits[i + 16], 16) & 3]}{hex_digits[i + 17:i + 20]}-{hex_digits[i + 20:i + 32]}"
+        for i in range(0, 32 * ID_POOL_SIZE, 32)
+    )
+    return _id_pool.popleft()
 
 
 class AlertType(str, Enum):
@@ -41,7 +67,7 @@ class AlertMetrics(BaseModel):
 
 
 class Alert(BaseModel):
-    alert_id: str = Field(default_factory=lambda: str(uuid4()))
+    alert_id: str = Field(default_factory=new_id)
     timestamp: datetime = Field(default_factory=datetime.now)
     source_system: str
     alert_type: AlertType
@@ -50,6 +76,8 @@ class Alert(BaseModel):
     metrics: AlertMetrics
     affected_services: List[str] = Field(default_factory=list)
     metadata: Dict[str, Any] = Field(default_factory=dict)
+    # Memoized cache signature, filled in by the orchestrator on first use
+    _signature: Optional[tuple] = PrivateAttr(default=None)
 
 
 class Classification(BaseModel):
@@ -75,7 +103,7 @@ class Resolution(BaseModel):
 
 
 class Incident(BaseModel):
-    incident_id: str = Field(default_factory=lambda: str(uuid4()))
+    incident_id: str = Field(default_factory=new_id)
     alert_id: str
     classification: Optional[Classification] = None
     timeline: List[TimelineEntry] = Field(default_factory=list)
@@ -95,7 +123,7 @@ class RunbookStep(BaseModel):
 
 
 class Runbook(BaseModel):
-    runbook_id: str = Field(default_factory=lambda: str(uuid4()))
+    runbook_id: str = Field(default_factory=new_id)
     category: str
     severity_level: str
     title: str
@@ -135,7 +163,7 @@ class ActionItem(BaseModel):
 
 
 class PostMortem(BaseModel):
-    report_id: str = Field(default_factory=lambda: str(uuid4()))
+    report_id: str = Field(default_factory=new_id)
     incident_id: str
     summary: PostMortemSummary
     timeline: List[PostMortemTimeline]